@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+PoseSim 性能基准测试
+
+离线运行：合成若干分辨率/长度的测试视频（以 input/Penguin.mp4 的画面为素材，
+缩放后放在纯色画布中，保证画面中有人体），连同 Penguin.mp4 原片一起，
+对每个 model_complexity 分别测量渲染、仅分析（headless）、流水线三种模式下的
+吞吐 FPS、单帧延迟分位数和峰值内存（RSS）。
+
+每个用例在独立子进程中运行，峰值内存互不影响；结果保存为 JSON，
+可用 --compare 对比两次运行的结果。
+
+使用示例:
+  python benchmarks/run_benchmarks.py --complexity 1 -o bench.json
+  python benchmarks/run_benchmarks.py --quick --complexity 0 1 2
+  python benchmarks/run_benchmarks.py --compare base.json bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(_ROOT, 'src'))
+
+SCHEMA_VERSION = 1
+
+PENGUIN = os.path.join(_ROOT, 'input', 'Penguin.mp4')
+CLIP_DIR = os.path.join(_ROOT, 'benchmarks', 'clips')
+
+# (名称, 宽, 高, 帧数)
+SYNTHETIC_CLIPS = [
+    ('synthetic_480p', 854, 480, 300),
+    ('synthetic_720p', 1280, 720, 300),
+    ('synthetic_1080p', 1920, 1080, 300),
+    ('synthetic_4k', 3840, 2160, 150),
+    ('synthetic_720p_long', 1280, 720, 1800)
+]
+
+QUICK_CLIPS = ['synthetic_480p', 'synthetic_1080p']
+
+MODES = ['render', 'headless', 'pipeline']
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description='PoseSim 性能基准测试',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('-o', '--output', type=str, default='benchmark_results.json',
+                        help='结果JSON文件路径')
+    parser.add_argument('--complexity', type=int, nargs='+', choices=[0, 1, 2],
+                        default=[0, 1, 2], help='要测试的模型复杂度')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES,
+                        help='要测试的处理模式')
+    parser.add_argument('--clips', nargs='+',
+                        help='只测试指定的视频（合成视频名称或 penguin）')
+    parser.add_argument('--quick', action='store_true',
+                        help='只测试少量较短的视频')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'),
+                        help='对比两个结果文件，不运行测试')
+    parser.add_argument('--threshold', type=float, default=0.05,
+                        help='对比时判定为性能回退的相对变化 (默认0.05)')
+    parser.add_argument('--case', type=str, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def generate_clip(name: str, width: int, height: int, frames: int) -> str:
+    """生成合成测试视频；同一规格只生成一次，之后直接复用"""
+    import cv2
+    import numpy as np
+
+    os.makedirs(CLIP_DIR, exist_ok=True)
+    path = os.path.join(CLIP_DIR, f"{name}_{width}x{height}_{frames}.avi")
+    if os.path.exists(path):
+        return path
+
+    source = cv2.VideoCapture(PENGUIN)
+    if not source.isOpened():
+        raise RuntimeError(f"Cannot open source video: {PENGUIN}")
+    src_w = int(source.get(cv2.CAP_PROP_FRAME_WIDTH))
+    src_h = int(source.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = source.get(cv2.CAP_PROP_FPS) or 30.0
+
+    # 人物占画面高度的 60%，水平方向缓慢平移，模拟宽画面中的小目标
+    scale = 0.6 * height / src_h
+    size = (max(1, int(src_w * scale)), max(1, int(src_h * scale)))
+    canvas = np.full((height, width, 3), 96, dtype=np.uint8)
+
+    tmp_path = path + '.tmp.avi'
+    out = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    try:
+        for i in range(frames):
+            ret, frame = source.read()
+            if not ret:
+                source.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = source.read()
+            canvas[:] = 96
+            x = int((width - size[0]) * (0.5 + 0.4 * np.sin(i / frames * 2 * np.pi)))
+            y = (height - size[1]) // 2
+            canvas[y:y + size[1], x:x + size[0]] = cv2.resize(frame, size)
+            out.write(canvas)
+    finally:
+        out.release()
+        source.release()
+
+    os.replace(tmp_path, path)
+    return path
+
+
+def collect_clips(args) -> list:
+    specs = SYNTHETIC_CLIPS
+    if args.quick:
+        specs = [spec for spec in specs if spec[0] in QUICK_CLIPS]
+    if args.clips:
+        specs = [spec for spec in SYNTHETIC_CLIPS if spec[0] in args.clips]
+
+    clips = []
+    for name, width, height, frames in specs:
+        print(f"Preparing clip {name} ({width}x{height}, {frames} frames)")
+        clips.append({'name': name, 'path': generate_clip(name, width, height, frames)})
+
+    if not args.clips or 'penguin' in args.clips:
+        clips.append({'name': 'penguin', 'path': PENGUIN})
+    return clips
+
+
+def run_case(case: dict) -> dict:
+    """在当前（子）进程中运行一个用例，返回测量结果"""
+    import resource
+    from config import MEDIAPIPE_CONFIG, VIDEO_CONFIG
+    from pose_estimator import PoseEstimator
+    from visualizer import PoseVisualizer
+    from video_processor import VideoProcessor
+    from profiler import StageProfiler
+
+    mediapipe_config = dict(MEDIAPIPE_CONFIG, model_complexity=case['complexity'])
+    video_config = dict(VIDEO_CONFIG, show_progress=False,
+                        pipeline=case['mode'] == 'pipeline')
+
+    start = time.perf_counter()
+    estimator = PoseEstimator(mediapipe_config)
+    startup = time.perf_counter() - start
+
+    profiler = StageProfiler()
+    visualizer = None if case['mode'] == 'headless' else PoseVisualizer(estimator)
+    processor = VideoProcessor(estimator, visualizer, video_config, profiler)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if case['mode'] == 'headless':
+            stats = processor.run_headless(case['path'], os.path.join(work_dir, 'out.csv'))
+        else:
+            stats = processor.run_video(case['path'], os.path.join(work_dir, 'out.mp4'))
+    estimator.close()
+
+    summary = profiler.summary()
+    latency = summary['latency'] or {}
+    return {
+        'frames': summary['frames'],
+        'frames_failed': stats['fail'],
+        'fps': summary['throughput_fps'],
+        'wall_s': summary['wall_s'],
+        'startup_s': startup,
+        'latency_ms': {key: latency.get(key) for key in ('mean_ms', 'p50_ms', 'p95_ms', 'p99_ms')},
+        # Linux 上 ru_maxrss 单位为 KB
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        'stages': {stage: {'mean_ms': s['mean_ms'], 'p95_ms': s['p95_ms'], 'share': s['share']}
+                   for stage, s in summary['stages'].items()}
+    }
+
+
+def spawn_case(case: dict) -> dict:
+    command = [sys.executable, os.path.abspath(__file__), '--case', json.dumps(case)]
+    proc = subprocess.run(command, capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        error = (proc.stderr.strip().splitlines() or ['unknown error'])[-1]
+        return {'error': error}
+    return json.loads(lines[-1])
+
+
+def system_info() -> dict:
+    import cv2
+    import numpy as np
+    import mediapipe as mp
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=_ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'mediapipe': getattr(mp, '__version__', None)
+    }
+
+
+def case_id(result: dict) -> str:
+    return f"{result['clip']}/c{result['complexity']}/{result['mode']}"
+
+
+def run_suite(args):
+    clips = collect_clips(args)
+    results = []
+    total = len(clips) * len(args.complexity) * len(args.modes)
+    print(f"\nRunning {total} benchmark cases\n")
+
+    for clip in clips:
+        for complexity in args.complexity:
+            for mode in args.modes:
+                case = {'clip': clip['name'], 'path': clip['path'],
+                        'complexity': complexity, 'mode': mode}
+                measured = spawn_case(case)
+                result = {key: case[key] for key in ('clip', 'complexity', 'mode')}
+                result.update(measured)
+                results.append(result)
+
+                if 'error' in measured:
+                    print(f"  {case_id(result):<40} ERROR: {measured['error']}")
+                else:
+                    print(f"  {case_id(result):<40} {measured['fps']:8.1f} FPS  "
+                          f"p95 {measured['latency_ms']['p95_ms']:8.2f} ms  "
+                          f"RSS {measured['peak_rss_mb']:7.1f} MB")
+
+    report = {'schema': SCHEMA_VERSION, 'system': system_info(), 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to: {args.output}")
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> int:
+    with open(base_path, encoding='utf-8') as f:
+        base = {case_id(r): r for r in json.load(f)['results'] if 'error' not in r}
+    with open(new_path, encoding='utf-8') as f:
+        new = {case_id(r): r for r in json.load(f)['results'] if 'error' not in r}
+
+    print(f"{'Case':<40}{'FPS base':>10}{'FPS new':>10}{'Change':>9}"
+          f"{'p95 base':>10}{'p95 new':>10}{'RSS change':>12}")
+    regressions = 0
+    for key in sorted(base.keys() & new.keys()):
+        b, n = base[key], new[key]
+        fps_change = n['fps'] / b['fps'] - 1 if b['fps'] else 0.0
+        rss_change = n['peak_rss_mb'] - b['peak_rss_mb']
+        flag = ''
+        if fps_change < -threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{key:<40}{b['fps']:>10.1f}{n['fps']:>10.1f}{fps_change:>+9.1%}"
+              f"{b['latency_ms']['p95_ms']:>10.2f}{n['latency_ms']['p95_ms']:>10.2f}"
+              f"{rss_change:>+10.1f}MB{flag}")
+
+    for key in sorted(base.keys() - new.keys()):
+        print(f"{key:<40} missing in {new_path}")
+    for key in sorted(new.keys() - base.keys()):
+        print(f"{key:<40} new case")
+
+    print(f"\n{regressions} regressions (threshold {threshold:.0%})")
+    return 1 if regressions else 0
+
+
+def main():
+    args = parse_arguments()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+    elif args.compare:
+        sys.exit(compare(args.compare[0], args.compare[1], args.threshold))
+    else:
+        run_suite(args)
+
+
+if __name__ == '__main__':
+    main()
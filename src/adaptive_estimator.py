@@ -0,0 +1,240 @@
+import atexit
+import csv
+import json
+import os
+import time
+import numpy as np
+from typing import Dict, Iterable, Optional
+from pose_estimator import PoseEstimator
+from profiler import NULL_PROFILER
+from config import MEDIAPIPE_CONFIG, INFERENCE_CONFIG, ADAPTIVE_CONFIG, LANDMARK_NAMES
+
+
+# 各复杂度推理耗时的大致比例，用于估计尚未运行过的级别的耗时
+COST_RATIO = {0: 1.0, 1: 1.5, 2: 4.0}
+
+
+def complexity_log_path_for(output_path: str) -> str:
+    return os.path.splitext(output_path)[0] + '.complexity.csv'
+
+
+def budget_seconds(inference_config: Dict) -> Optional[float]:
+    """由 latency_budget_ms 或 target_fps 得到每次推理的耗时预算（秒），都未设置时返回 None"""
+    if inference_config.get('latency_budget_ms'):
+        return inference_config['latency_budget_ms'] / 1000.0
+    if inference_config.get('target_fps'):
+        return 1.0 / inference_config['target_fps']
+    return None
+
+
+def create_estimator(config: Optional[Dict] = None) -> PoseEstimator:
+    """设置了耗时预算时返回 AdaptivePoseEstimator，否则返回固定复杂度的 PoseEstimator"""
+    config = config or MEDIAPIPE_CONFIG
+    if budget_seconds(config) is not None:
+        return AdaptivePoseEstimator(config)
+    return PoseEstimator(config)
+
+
+# 进程内按配置缓存的估计器，见 shared_estimator
+_shared_estimators: Dict[str, PoseEstimator] = {}
+
+
+def shared_estimator(config: Optional[Dict] = None) -> PoseEstimator:
+    """
+    同一进程内相同配置只构建一次计算图：再次请求时复用已有的估计器并重置其跟踪状态，
+    进程退出前统一关闭。调用方不应自行 close()。
+    """
+    config = config or MEDIAPIPE_CONFIG
+    key = json.dumps(config, sort_keys=True, default=str)
+    estimator = _shared_estimators.get(key)
+    if estimator is None:
+        estimator = _shared_estimators[key] = create_estimator(config)
+        # 解释器退出阶段再由 __del__ 关闭 MediaPipe 图会卡死，需在退出前显式关闭
+        atexit.register(estimator.close)
+    else:
+        estimator.reset()
+    return estimator
+
+
+class ComplexityController:
+    """
+    根据每帧推理耗时与关键点平均可见度选择模型复杂度。
+    耗时与可见度都取指数滑动平均；切换后的前几帧需要重新检测，耗时不计入平均。
+    """
+
+    def __init__(self, complexities: Iterable[int], start: int, budget: float,
+                 config: Optional[Dict] = None):
+        self.config = dict(ADAPTIVE_CONFIG, **(config or {}))
+        self.levels = sorted(set(complexities) | {start})
+        self.level = start
+        self.budget = budget
+        self.cost: Dict[int, float] = {}
+        self.visibility: Optional[float] = None
+        self._since_switch = 0
+
+    def disable(self, level: int):
+        """把无法使用的复杂度（如模型文件无法下载）移出候选"""
+        if level in self.levels and level != self.level:
+            self.levels.remove(level)
+
+    def predict_cost(self, level: int) -> float:
+        if level in self.cost:
+            return self.cost[level]
+        current = self.cost.get(self.level, self.budget)
+        return current * COST_RATIO.get(level, 1.0) / COST_RATIO.get(self.level, 1.0)
+
+    def update(self, seconds: float, visibility: float) -> int:
+        """记录本帧的推理耗时与平均可见度，返回下一帧应使用的复杂度"""
+        alpha = self.config['ema_alpha']
+        self._since_switch += 1
+        if self._since_switch > self.config['settle_frames']:
+            previous = self.cost.get(self.level)
+            self.cost[self.level] = (seconds if previous is None
+                                     else previous + alpha * (seconds - previous))
+        self.visibility = (visibility if self.visibility is None
+                           else self.visibility + alpha * (visibility - self.visibility))
+
+        if self._since_switch <= self.config['settle_frames'] or self.level not in self.cost:
+            return self.level
+
+        index = self.levels.index(self.level)
+        lower = self.levels[index - 1] if index > 0 else None
+        higher = self.levels[index + 1] if index + 1 < len(self.levels) else None
+
+        target = self.level
+        if self.cost[self.level] > self.budget:
+            if lower is not None:
+                target = lower
+        elif self._since_switch >= self.config['min_dwell_frames']:
+            if (higher is not None and self.visibility < self.config['low_visibility'] and
+                    self.predict_cost(higher) <= self.budget * self.config['headroom']):
+                target = higher
+            elif lower is not None and self.visibility > self.config['high_visibility']:
+                target = lower
+
+        if target != self.level:
+            self.level = target
+            self._since_switch = 0
+        return self.level
+
+
+class AdaptivePoseEstimator(PoseEstimator):
+    """
+    在多个复杂度的 PoseEstimator 之间切换，使推理耗时保持在预算内。
+    各复杂度的模型在第一次切换到该级别时才创建，创建失败的级别不再使用；
+    切回之前用过的模型时先丢弃其跟踪状态，避免沿用过时的人体区域。
+    """
+
+    adaptive = True
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = config or MEDIAPIPE_CONFIG
+        self.inference_config = {key: self.config.get(key, default)
+                                 for key, default in INFERENCE_CONFIG.items()}
+        self.pose = None
+        self.landmark_names = list(LANDMARK_NAMES)
+        self.landmark_dict = {name: idx for idx, name in enumerate(self.landmark_names)}
+
+        start = self.config.get('model_complexity', MEDIAPIPE_CONFIG['model_complexity'])
+        self.estimators: Dict[int, PoseEstimator] = {start: PoseEstimator(self.config)}
+        self.controller = ComplexityController(ADAPTIVE_CONFIG['complexities'], start,
+                                               budget_seconds(self.inference_config))
+        self._complexity = start
+        self._profiler = NULL_PROFILER
+
+    @property
+    def complexity(self) -> int:
+        return self._complexity
+
+    @property
+    def profiler(self):
+        return self._profiler
+
+    @profiler.setter
+    def profiler(self, profiler):
+        self._profiler = profiler
+        for estimator in self.estimators.values():
+            estimator.profiler = profiler
+
+    def estimate(self, image: np.ndarray) -> Optional[object]:
+        level = self.controller.level
+        estimator = self.estimators[level]
+
+        started = time.perf_counter()
+        results = estimator.estimate(image)
+        seconds = time.perf_counter() - started
+        self._complexity = level
+
+        landmarks = self.get_landmark_array(results)
+        visibility = float(landmarks[:, 3].mean()) if landmarks is not None else 0.0
+        target = self.controller.update(seconds, visibility)
+        if target != level:
+            self._activate(target)
+        return results
+
+    def _activate(self, level: int):
+        estimator = self.estimators.get(level)
+        if estimator is not None:
+            estimator.reset_tracking()
+            return
+
+        try:
+            estimator = PoseEstimator(dict(self.config, model_complexity=level))
+        except Exception as e:
+            print(f"Warning: Cannot load model complexity {level}: {str(e)}")
+            self.controller.level = self._complexity
+            self.controller.disable(level)
+            return
+
+        estimator.profiler = self._profiler
+        self.estimators[level] = estimator
+
+    def reset_tracking(self):
+        for estimator in self.estimators.values():
+            estimator.reset_tracking()
+
+    def reset(self):
+        for estimator in self.estimators.values():
+            estimator.reset()
+
+    def close(self):
+        for estimator in getattr(self, 'estimators', {}).values():
+            estimator.close()
+
+
+class ComplexityLog:
+    """逐帧记录所用的模型复杂度（CSV：frame, complexity）；插值帧未经推理，复杂度留空"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(['frame', 'complexity'])
+        self.counts: Dict[int, int] = {}
+
+    def append(self, index: int, complexity: Optional[int]):
+        self._writer.writerow([index, '' if complexity is None else complexity])
+        if complexity is not None:
+            self.counts[complexity] = self.counts.get(complexity, 0) + 1
+
+    @staticmethod
+    def concatenate(paths, output_path: str):
+        """按顺序合并分段处理产生的日志，帧号本身已是整段视频中的绝对帧号"""
+        with open(output_path, 'w', newline='', encoding='utf-8') as out:
+            out.write('frame,complexity\n')
+            for path in paths:
+                with open(path, encoding='utf-8') as f:
+                    next(f, None)
+                    for line in f:
+                        out.write(line)
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
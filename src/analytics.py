@@ -0,0 +1,122 @@
+import csv
+import os
+import numpy as np
+from typing import List, Optional
+from config import LANDMARK_NAMES
+from pose_estimator import PoseEstimator
+from angles import AngleEngine
+
+
+LANDMARK_FIELDS = ('x', 'y', 'z', 'visibility')
+
+
+class AnalyticsWriter:
+    """
+    逐帧写出关键点与关节角度表：每行一帧，列为帧号、时间、是否检测到人体、
+    33 个关键点的 x/y/z/visibility 以及 ANGLES_TO_DISPLAY 中的各个角度。
+    按扩展名选择格式：.parquet 需要 pyarrow，其余写 CSV。
+    帧先累积到固定大小的批次中，整批计算角度后再写出。
+    """
+
+    def __init__(self, path: str, fps: float, width: int, height: int,
+                 batch_size: int = 256):
+        self.path = path
+        self.fps = fps
+        self.image_shape = (height, width)
+        self.batch_size = batch_size
+        self.angle_engine = AngleEngine({name: idx for idx, name in enumerate(LANDMARK_NAMES)})
+        self.columns = self._build_columns()
+
+        num = len(LANDMARK_NAMES)
+        self._indices = np.zeros(batch_size, dtype=np.int64)
+        self._landmarks = np.full((batch_size, num, 4), np.nan, dtype=np.float32)
+        self._detected = np.zeros(batch_size, dtype=bool)
+        self._count = 0
+        self.rows = 0
+
+        self._parquet = os.path.splitext(path)[1].lower() == '.parquet'
+        if self._parquet:
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise ImportError("Writing Parquet requires pyarrow: pip install pyarrow")
+            self._pa = pyarrow
+            self._schema = pyarrow.schema(
+                [('frame', pyarrow.int64()), ('time', pyarrow.float64()),
+                 ('detected', pyarrow.bool_())] +
+                [(name, pyarrow.float32()) for name in self.columns[3:]]
+            )
+            self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+        else:
+            self._file = open(path, 'w', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.columns)
+
+    def _build_columns(self) -> List[str]:
+        columns = ['frame', 'time', 'detected']
+        for name in LANDMARK_NAMES:
+            columns.extend(f"{name}_{field}" for field in LANDMARK_FIELDS)
+        columns.extend(self.angle_engine.names)
+        return columns
+
+    def append(self, index: int, landmarks: Optional[np.ndarray]):
+        slot = self._count
+        self._indices[slot] = index
+        if landmarks is None:
+            self._landmarks[slot] = np.nan
+            self._detected[slot] = False
+        else:
+            self._landmarks[slot] = landmarks
+            self._detected[slot] = True
+        self._count += 1
+
+        if self._count == self.batch_size:
+            self.flush()
+
+    def flush(self):
+        count = self._count
+        if count == 0:
+            return
+
+        landmarks = self._landmarks[:count]
+        detected = self._detected[:count]
+        # 与画面上显示的角度一致：在整数像素坐标上计算
+        points = PoseEstimator.to_pixel_coords(np.nan_to_num(landmarks), self.image_shape)
+        visible = PoseEstimator.get_visibility_mask(landmarks) & detected[:, None]
+        angles = self.angle_engine.compute_series(points, visible)
+
+        frames = self._indices[:count]
+        times = (frames - 1) / self.fps if self.fps else np.zeros(count)
+        values = np.concatenate([landmarks.reshape(count, -1),
+                                 angles.astype(np.float32)], axis=1)
+
+        if self._parquet:
+            arrays = [self._pa.array(frames), self._pa.array(times),
+                      self._pa.array(detected)]
+            arrays.extend(self._pa.array(values[:, i]) for i in range(values.shape[1]))
+            self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+        else:
+            for i in range(count):
+                row = [int(frames[i]), f"{times[i]:.4f}", int(detected[i])]
+                row.extend('' if np.isnan(v) else f"{v:.6g}" for v in values[i])
+                self._writer.writerow(row)
+
+        self.rows += count
+        self._count = 0
+
+    def close(self):
+        if self._writer is None:
+            return
+        self.flush()
+        if self._parquet:
+            self._writer.close()
+        else:
+            self._file.close()
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
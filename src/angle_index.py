@@ -0,0 +1,384 @@
+import hashlib
+import json
+import math
+import os
+import re
+import struct
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import ANGLES_TO_DISPLAY, LANDMARK_NAMES, INDEX_CONFIG
+from landmark_store import LandmarkStore, SIDECAR_EXTENSION
+from angles import AngleEngine
+from pose_estimator import PoseEstimator
+
+
+INDEX_EXTENSION = '.angles'
+MANIFEST_NAME = 'index.json'
+
+_MAGIC = b'POSEIDX\x01'
+_HEADER = struct.Struct('<8sIQIId')
+_HEADER_SIZE = 64
+_MANIFEST_VERSION = 1
+
+
+def build_pyramid(series: np.ndarray, factor: int) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    series 为 (角度数, 帧数)，NaN 表示该帧角度不可用。每一层把上一层每 factor 个块合并为一块，
+    返回各层的 (min, max, mean)，形状均为 (角度数, 块数)；最后一层只有一块，即整段视频的统计。
+    全为 NaN 的块三项均为 NaN。
+    """
+    valid = ~np.isnan(series)
+    mins, maxs = series, series
+    sums = np.where(valid, series, 0.0).astype(np.float64)
+    counts = valid.astype(np.int64)
+
+    levels = []
+    while True:
+        num = mins.shape[1]
+        blocks = max(1, -(-num // factor))
+        pad = blocks * factor - num
+
+        def reduce(values, fill, ufunc):
+            if pad:
+                values = np.concatenate([values, np.full((values.shape[0], pad), fill,
+                                                         dtype=values.dtype)], axis=1)
+            return ufunc.reduce(values.reshape(values.shape[0], blocks, factor), axis=2)
+
+        # fmin/fmax 忽略 NaN，整块都是 NaN 时结果才为 NaN
+        mins = reduce(mins, np.nan, np.fmin)
+        maxs = reduce(maxs, np.nan, np.fmax)
+        sums = reduce(sums, 0.0, np.add)
+        counts = reduce(counts, 0, np.add)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = np.where(counts > 0, sums / counts, np.nan)
+
+        levels.append((mins.astype(np.float32), maxs.astype(np.float32),
+                       means.astype(np.float32)))
+        if blocks == 1:
+            return levels
+
+
+def write_index_file(path: str, series: np.ndarray, fps: float, factor: int):
+    """
+    单个视频的索引文件：64 字节文件头 | 第 0 层逐帧角度 float32 (角度数, 帧数) |
+    第 1..L 层依次为 min、max、mean，各为 float32 (角度数, 块数)。
+    按关节连续存放，查询某个关节时只读取它自己的数据。
+    """
+    levels = build_pyramid(series, factor)
+    num_angles, num_frames = series.shape
+
+    staging = path + '.tmp'
+    with open(staging, 'wb') as f:
+        header = _HEADER.pack(_MAGIC, num_angles, num_frames, factor, len(levels), fps)
+        f.write(header.ljust(_HEADER_SIZE, b'\0'))
+        f.write(np.ascontiguousarray(series, dtype=np.float32).tobytes())
+        for level in levels:
+            for values in level:
+                f.write(np.ascontiguousarray(values).tobytes())
+    os.replace(staging, path)
+    return levels[-1]
+
+
+class VideoIndex:
+    """只读打开单个视频的索引文件，各层均以内存映射方式访问，只有被查询到的区间才会读盘"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER_SIZE)
+        if len(header) < _HEADER_SIZE or header[:8] != _MAGIC:
+            raise ValueError(f"Not an angle index file: {path}")
+
+        (_, self.num_angles, self.num_frames, self.factor,
+         num_levels, self.fps) = _HEADER.unpack_from(header)
+
+        offset = _HEADER_SIZE
+        self.series = np.memmap(path, dtype=np.float32, mode='r', offset=offset,
+                                shape=(self.num_angles, self.num_frames))
+        offset += self.series.nbytes
+
+        # levels[l - 1] 为第 l 层的 (min, max, mean)，第 l 层每块覆盖 factor**l 帧
+        self.levels = []
+        blocks = self.num_frames
+        for _ in range(num_levels):
+            blocks = max(1, -(-blocks // self.factor))
+            arrays = []
+            for _ in range(3):
+                arrays.append(np.memmap(path, dtype=np.float32, mode='r', offset=offset,
+                                        shape=(self.num_angles, blocks)))
+                offset += arrays[-1].nbytes
+            self.levels.append(tuple(arrays))
+
+    def block_frames(self, level: int) -> int:
+        return self.factor ** level
+
+    def overview(self, angle: int, level: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """第 level 层某个关节的 (min, max, mean) 序列，用于快速绘制长视频的角度概览"""
+        mins, maxs, means = self.levels[level - 1]
+        return np.asarray(mins[angle]), np.asarray(maxs[angle]), np.asarray(means[angle])
+
+    @staticmethod
+    def _match(low: np.ndarray, high: np.ndarray, below: Optional[float],
+               above: Optional[float]) -> np.ndarray:
+        """块内最小值低于 below 且最大值高于 above 时才可能含有满足条件的帧（逐帧时 low 即 high）"""
+        mask = np.ones(len(low), dtype=bool)
+        if below is not None:
+            mask &= low < below
+        if above is not None:
+            mask &= high > above
+        return mask
+
+    @staticmethod
+    def _split_runs(ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """有序索引中编号连续的段，返回每段首、尾元素在 ids 中的位置"""
+        breaks = np.flatnonzero(np.diff(ids) != 1) + 1
+        return np.concatenate(([0], breaks)), np.concatenate((breaks - 1, [len(ids) - 1]))
+
+    def _children(self, blocks: np.ndarray, count: int) -> np.ndarray:
+        ids = (blocks[:, None] * self.factor + np.arange(self.factor)).ravel()
+        return ids[ids < count]
+
+    def find(self, angle: int, below: Optional[float], above: Optional[float],
+             min_frames: int, stats: Optional[Dict] = None
+             ) -> List[Tuple[int, int, float, float, float]]:
+        """
+        返回该关节角度持续满足 above < 角度 < below 至少 min_frames 帧的全部区间
+        (start, end, min, max, mean)，区间为 [start, end)。
+        从最粗的层开始：min/max 不可能满足条件的块被剪掉，相邻候选块拼成的区间短于
+        min_frames 帧的也被剪掉，只展开剩下的块进入下一层，最后才读取这些块内的逐帧数据。
+        满足条件的区间必然落在一段连续的候选块内，因此剪枝不会漏掉结果。
+        """
+        blocks = np.arange(1)
+        for level in range(len(self.levels), 0, -1):
+            mins, maxs, _ = self.levels[level - 1]
+            size = self.block_frames(level)
+            ids = self._children(blocks, mins.shape[1]) if level < len(self.levels) else blocks
+            ids = ids[self._match(mins[angle, ids], maxs[angle, ids], below, above)]
+            if len(ids) == 0:
+                return []
+
+            first, last = self._split_runs(ids)
+            frames = np.minimum((ids[last] + 1) * size, self.num_frames) - ids[first] * size
+            keep = frames >= min_frames
+            blocks = ids[np.repeat(keep, last - first + 1)]
+            if len(blocks) == 0:
+                return []
+
+        ids = self._children(blocks, self.num_frames)
+        values = self.series[angle, ids]
+        if stats is not None:
+            stats['frames_read'] += len(ids)
+        mask = self._match(values, values, below, above)
+        ids, values = ids[mask], values[mask]
+        if len(ids) == 0:
+            return []
+
+        first, last = self._split_runs(ids)
+        keep = last - first + 1 >= min_frames
+        first, last = first[keep], last[keep]
+        if len(first) == 0:
+            return []
+        # 按 [首, 尾+1) 成对的边界分段归约，取偶数段即各区间；末尾补一个元素保证边界合法
+        values = np.append(values.astype(np.float64), 0.0)
+        bounds = np.column_stack((first, last + 1)).ravel()
+        runs_min = np.minimum.reduceat(values, bounds)[::2]
+        runs_max = np.maximum.reduceat(values, bounds)[::2]
+        means = np.add.reduceat(values, bounds)[::2] / (last - first + 1)
+        return list(zip(ids[first].tolist(), (ids[last] + 1).tolist(), runs_min.tolist(),
+                        runs_max.tolist(), means.tolist()))
+
+
+_QUERY_PATTERN = re.compile(
+    r'^\s*(?:(?P<low>-?[\d.]+)\s*<\s*)?(?P<angle>[^<>\s]+)\s*'
+    r'(?:(?P<op><|>)\s*(?P<value>-?[\d.]+))?\s*$'
+)
+
+
+def parse_query(expression: str) -> Tuple[str, Optional[float], Optional[float]]:
+    """
+    解析查询条件，返回 (角度名, below, above)：
+    '左膝角度<90'、'LEFT_KNEE>160'、'80<LEFT_KNEE<120'。
+    """
+    match = _QUERY_PATTERN.match(expression)
+    if match is None or match.group('op') is None:
+        raise ValueError(f"Invalid query: {expression!r} (expected e.g. 'LEFT_KNEE<90' "
+                         f"or '80<LEFT_KNEE<120')")
+    value = float(match.group('value'))
+    below, above = (value, None) if match.group('op') == '<' else (None, value)
+    if match.group('low') is not None:
+        if match.group('op') != '<':
+            raise ValueError(f"Invalid query: {expression!r}")
+        above = float(match.group('low'))
+    return match.group('angle'), below, above
+
+
+class AngleIndex:
+    """
+    多分辨率关节角度索引：每个已处理视频（.pose 关键点文件）对应一个索引文件，保存
+    ANGLES_TO_DISPLAY 中各关节的逐帧角度，以及按 pyramid_factor 逐层合并的 min/max/mean 金字塔。
+    清单 index.json 记录每个视频的来源、帧率、帧数与整段统计，查询时先用整段统计剪掉不可能命中的
+    视频，再逐层向下剪枝，最后只读取候选区间内的逐帧数据。
+
+    角度与画面上显示的一致：在整数像素坐标上计算，关键点不可见或未检测到人体的帧为 NaN，
+    会打断持续区间。
+    """
+
+    def __init__(self, index_dir: str, config: Optional[Dict] = None):
+        self.index_dir = index_dir
+        self.config = dict(INDEX_CONFIG, **(config or {}))
+        self.angle_engine = AngleEngine({name: idx for idx, name in enumerate(LANDMARK_NAMES)})
+        os.makedirs(index_dir, exist_ok=True)
+        self._manifest_path = os.path.join(index_dir, MANIFEST_NAME)
+        self.entries = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        try:
+            with open(self._manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if (manifest.get('version') != _MANIFEST_VERSION or
+                manifest.get('angles') != self.angle_engine.names):
+            # 角度定义变化后旧索引全部作废
+            return {}
+        return manifest['videos']
+
+    def _save_manifest(self):
+        staging = self._manifest_path + '.tmp'
+        with open(staging, 'w', encoding='utf-8') as f:
+            json.dump({'version': _MANIFEST_VERSION, 'angles': self.angle_engine.names,
+                       'videos': self.entries}, f, ensure_ascii=False, indent=1)
+        os.replace(staging, self._manifest_path)
+
+    def angle_id(self, name: str) -> int:
+        """按角度名（如 '左膝角度'）或标注位置的关键点名（如 'LEFT_KNEE'，不区分大小写）查找"""
+        for i, angle_info in enumerate(ANGLES_TO_DISPLAY):
+            if name == angle_info['name'] or name.upper() == angle_info['position']:
+                return i
+        choices = ', '.join(f"{info['position']} ({info['name']})" for info in ANGLES_TO_DISPLAY)
+        raise ValueError(f"Unknown angle '{name}', choose from: {choices}")
+
+    @staticmethod
+    def _key_for(source: str) -> str:
+        return hashlib.sha1(os.path.abspath(source).encode('utf-8')).hexdigest()[:16]
+
+    def compute_series(self, store: LandmarkStore) -> np.ndarray:
+        """从关键点文件分批计算全部角度，返回 (角度数, 帧数) float32"""
+        chunk = self.config['build_chunk_frames']
+        series = np.empty((len(self.angle_engine.names), len(store)), dtype=np.float32)
+        for start in range(0, len(store), chunk):
+            end = min(start + chunk, len(store))
+            landmarks = np.asarray(store.landmarks[start:end])
+            detected = np.asarray(store.detected[start:end])
+            points = PoseEstimator.to_pixel_coords(landmarks, (store.height, store.width))
+            visible = PoseEstimator.get_visibility_mask(landmarks) & detected[:, None]
+            series[:, start:end] = self.angle_engine.compute_series(points, visible).T
+        return series
+
+    def add(self, source: str) -> bool:
+        """为一个 .pose 文件建立（或更新）索引；文件未变化时跳过，返回是否重建"""
+        stat = os.stat(source)
+        key = self._key_for(source)
+        entry = self.entries.get(key)
+        if (entry is not None and entry['source_size'] == stat.st_size and
+                entry['source_mtime'] == stat.st_mtime and
+                os.path.exists(os.path.join(self.index_dir, entry['file']))):
+            return False
+
+        store = LandmarkStore(source)
+        series = self.compute_series(store)
+        file_name = key + INDEX_EXTENSION
+        mins, maxs, means = write_index_file(os.path.join(self.index_dir, file_name), series,
+                                             store.fps, self.config['pyramid_factor'])
+
+        def to_list(values):
+            return [None if np.isnan(v) else round(float(v), 4) for v in values[:, 0]]
+
+        self.entries[key] = {
+            'source': os.path.abspath(source),
+            'source_size': stat.st_size,
+            'source_mtime': stat.st_mtime,
+            'file': file_name,
+            'fps': store.fps,
+            'frames': len(store),
+            'min': to_list(mins),
+            'max': to_list(maxs),
+            'mean': to_list(means)
+        }
+        return True
+
+    def build(self, paths: Iterable[str]) -> Dict[str, int]:
+        """为给定的 .pose 文件或目录（递归查找 .pose）建立索引，并删除来源已不存在的条目"""
+        sources = []
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    sources.extend(os.path.join(root, name) for name in sorted(files)
+                                   if name.endswith(SIDECAR_EXTENSION))
+            else:
+                sources.append(path)
+
+        result = {'indexed': 0, 'unchanged': 0, 'failed': 0, 'removed': 0}
+        for source in sources:
+            try:
+                if self.add(source):
+                    result['indexed'] += 1
+                    print(f"  Indexed: {source}")
+                else:
+                    result['unchanged'] += 1
+            except (OSError, ValueError) as e:
+                result['failed'] += 1
+                print(f"  Failed: {source} ({str(e)})")
+
+        for key, entry in list(self.entries.items()):
+            if not os.path.exists(entry['source']):
+                self._remove(key)
+                result['removed'] += 1
+        self._save_manifest()
+        return result
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key)
+        try:
+            os.remove(os.path.join(self.index_dir, entry['file']))
+        except FileNotFoundError:
+            pass
+
+    def query(self, angle: str, below: Optional[float] = None, above: Optional[float] = None,
+              min_duration: float = 0.0, stats: Optional[Dict] = None) -> List[Dict]:
+        """
+        在全部已索引视频中查找角度持续满足 above < 角度 < below 至少 min_duration 秒的区间。
+        返回按来源与起始帧排序的结果，帧号从 1 开始，区间两端包含。
+        stats 若给出，填入视频总数、被整段剪掉的视频数、总帧数与实际读取的逐帧数据帧数。
+        """
+        if below is None and above is None:
+            raise ValueError("Query needs at least one bound")
+        angle_id = self.angle_id(angle)
+        stats = stats if stats is not None else {}
+        stats.update(videos=len(self.entries), videos_pruned=0, frames=0, frames_read=0)
+
+        results = []
+        for entry in sorted(self.entries.values(), key=lambda entry: entry['source']):
+            stats['frames'] += entry['frames']
+            low, high = entry['min'][angle_id], entry['max'][angle_id]
+            if (low is None or (below is not None and low >= below) or
+                    (above is not None and high <= above)):
+                stats['videos_pruned'] += 1
+                continue
+
+            fps = entry['fps'] or 1.0
+            min_frames = max(1, math.ceil(min_duration * fps - 1e-9))
+            video = VideoIndex(os.path.join(self.index_dir, entry['file']))
+            for start, end, low, high, mean in video.find(angle_id, below, above,
+                                                          min_frames, stats):
+                results.append({
+                    'source': entry['source'],
+                    'start_frame': start + 1,
+                    'end_frame': end,
+                    'start_time': start / fps,
+                    'duration': (end - start) / fps,
+                    'min': low,
+                    'max': high,
+                    'mean': mean
+                })
+        return results
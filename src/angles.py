@@ -0,0 +1,50 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from config import ANGLES_TO_DISPLAY
+
+
+class AngleEngine:
+    """
+    批量关节角度计算：根据 ANGLES_TO_DISPLAY 预先生成关键点索引三元组，
+    一次向量化运算得到单帧或多帧的全部关节角度（单位：度）。
+    """
+    
+    def __init__(self, landmark_dict: Dict[str, int],
+                 angles: Optional[List[Dict]] = None):
+        angles = angles if angles is not None else ANGLES_TO_DISPLAY
+        self.names = [angle_info['name'] for angle_info in angles]
+        self.triplets = np.array([[landmark_dict[name] for name in angle_info['points']]
+                                  for angle_info in angles],
+                                 dtype=np.intp).reshape(-1, 3)
+        self.positions = np.array([landmark_dict[angle_info['position']]
+                                   for angle_info in angles], dtype=np.intp)
+    
+    def compute(self, points: np.ndarray, visible: Optional[np.ndarray] = None,
+                scale: Optional[Tuple[float, float]] = None) -> np.ndarray:
+        """单帧：points 为 (33, 2+)，返回 (角度数,)，不可见的角度为 NaN"""
+        return self.compute_series(points[None], None if visible is None else visible[None],
+                                   scale)[0]
+    
+    def compute_series(self, points: np.ndarray, visible: Optional[np.ndarray] = None,
+                       scale: Optional[Tuple[float, float]] = None) -> np.ndarray:
+        """多帧：points 为 (帧数, 33, 2+)，返回 (帧数, 角度数)；scale 用于把归一化坐标换算为像素"""
+        coords = points[..., :2].astype(np.float64)
+        if scale is not None:
+            coords = coords * np.asarray(scale, dtype=np.float64)
+        
+        joints = coords[:, self.triplets]
+        vector1 = joints[:, :, 0] - joints[:, :, 1]
+        vector2 = joints[:, :, 2] - joints[:, :, 1]
+        
+        dot = np.einsum('fak,fak->fa', vector1, vector2)
+        norm = (np.sqrt(np.einsum('fak,fak->fa', vector1, vector1)) *
+                np.sqrt(np.einsum('fak,fak->fa', vector2, vector2)))
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cos_angle = np.clip(dot / norm, -1.0, 1.0)
+        angles = np.degrees(np.arccos(cos_angle))
+        
+        if visible is not None:
+            angles[~visible[:, self.triplets].all(axis=2)] = np.nan
+        
+        return angles
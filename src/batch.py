@@ -0,0 +1,236 @@
+import atexit
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+from tqdm import tqdm
+from adaptive_estimator import create_estimator
+from visualizer import PoseVisualizer
+from video_processor import VideoProcessor, VideoProcessingError
+from landmark_store import sidecar_path_for
+from result_cache import ResultCache
+from config import BATCH_CONFIG
+
+
+_worker_processor: Optional[VideoProcessor] = None
+
+
+def build_processor(mediapipe_config: Dict, video_config: Dict,
+                    render_only: bool = False) -> VideoProcessor:
+    video_config = dict(video_config, show_progress=False)
+    if render_only:
+        return VideoProcessor(None, PoseVisualizer(), video_config)
+    estimator = create_estimator(mediapipe_config)
+    visualizer = PoseVisualizer(estimator)
+    return VideoProcessor(estimator, visualizer, video_config)
+
+
+def _close_processor(processor: VideoProcessor):
+    if processor.estimator is not None:
+        processor.estimator.close()
+
+
+def _init_worker(mediapipe_config: Dict, video_config: Dict, render_only: bool = False):
+    global _worker_processor
+    _worker_processor = build_processor(mediapipe_config, video_config, render_only)
+    # 解释器退出阶段再由 __del__ 关闭 MediaPipe 图会卡死，需在退出前显式关闭
+    atexit.register(_close_processor, _worker_processor)
+
+
+def _make_result(input_path: str, output_path: str, frame_count: int) -> Dict:
+    return {
+        'input': input_path,
+        'output': output_path,
+        'frames': frame_count,
+        'success': False,
+        'frames_ok': 0,
+        'frames_failed': 0,
+        'seconds': 0.0,
+        'error': None,
+        'cached': False,
+        'pid': os.getpid()
+    }
+
+
+def _process_job(processor: VideoProcessor, input_path: str, output_path: str,
+                 frame_count: int, landmarks_path: Optional[str] = None,
+                 landmark_source: Optional[str] = None) -> Dict:
+    result = _make_result(input_path, output_path, frame_count)
+    result['cached'] = landmark_source is not None
+    
+    start = time.perf_counter()
+    try:
+        if landmark_source is None:
+            # 复用常驻的估计器，只重置跟踪状态，不重新加载模型
+            processor.estimator.reset()
+        if processor.config.get('headless', False):
+            stats = processor.run_headless(input_path, output_path,
+                                           landmarks_path=landmarks_path,
+                                           landmark_source=landmark_source)
+        else:
+            stats = processor.run_video(input_path, output_path,
+                                        landmarks_path=landmarks_path,
+                                        landmark_source=landmark_source)
+        result['success'] = True
+        result['frames_ok'] = stats['success']
+        result['frames_failed'] = stats['fail']
+        result['error'] = stats['first_error']
+    except VideoProcessingError as e:
+        result['error'] = str(e)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {str(e)}"
+    result['seconds'] = time.perf_counter() - start
+    
+    return result
+
+
+def _run_job(input_path: str, output_path: str, frame_count: int,
+             landmarks_path: Optional[str] = None,
+             landmark_source: Optional[str] = None) -> Dict:
+    return _process_job(_worker_processor, input_path, output_path, frame_count,
+                        landmarks_path, landmark_source)
+
+
+class BatchEngine:
+    """
+    多进程批处理引擎：每个工作进程只加载一次 PoseEstimator 并处理多个视频，
+    任务按帧数从长到短调度，所有结果在结束时统一汇报。
+    启用结果缓存时，内容与推理参数都相同的输入直接用缓存的关键点重新渲染，跳过推理。
+    """
+    
+    def __init__(self, mediapipe_config: Dict, video_config: Dict,
+                 workers: Optional[int] = None, cache: Optional[ResultCache] = None):
+        self.mediapipe_config = mediapipe_config
+        self.video_config = video_config
+        self.cache = cache
+        self._cache_keys: Dict[str, str] = {}
+        workers = workers if workers is not None else BATCH_CONFIG['workers']
+        self.workers = max(1, workers or os.cpu_count() or 1)
+    
+    def plan(self, jobs: List[Tuple[str, str]]) -> Tuple[List[Tuple], List[Dict]]:
+        """返回 (按帧数降序排列的任务, 无法打开的输入对应的失败结果)；
+        每个任务为 (输入, 输出, 帧数, 关键点输出路径, 缓存的关键点文件)"""
+        planned = []
+        rejected = []
+        save_landmarks = self.video_config.get('save_landmarks', False)
+        for input_path, output_path in jobs:
+            info = VideoProcessor.get_video_info(input_path)
+            if info is None:
+                result = _make_result(input_path, output_path, 0)
+                result['pid'] = None
+                result['error'] = f"Cannot open video file: {input_path}"
+                rejected.append(result)
+                continue
+            
+            landmarks_path = sidecar_path_for(output_path) if save_landmarks else None
+            landmark_source = None
+            if self.cache is not None:
+                key = self.cache.key_for(input_path, self.mediapipe_config)
+                self._cache_keys[input_path] = key
+                landmark_source = self.cache.lookup(key)
+            planned.append((input_path, output_path, info['frame_count'],
+                            landmarks_path, landmark_source))
+        
+        planned.sort(key=lambda job: job[2], reverse=True)
+        return planned, rejected
+    
+    def _resolve(self, job: Tuple) -> Tuple:
+        """派发前再查一次缓存（同批次内的重复内容此时可能已被写入），
+        未命中时为关键点分配暂存文件以便完成后写入缓存"""
+        input_path, output_path, frame_count, landmarks_path, landmark_source = job
+        if self.cache is None or landmark_source is not None:
+            return job
+        
+        key = self._cache_keys[input_path]
+        landmark_source = self.cache.lookup(key)
+        if landmark_source is None and landmarks_path is None:
+            landmarks_path = self.cache.staging_path(key)
+        return input_path, output_path, frame_count, landmarks_path, landmark_source
+    
+    def _update_cache(self, job: Tuple, result: Dict):
+        input_path, _, _, landmarks_path, landmark_source = job
+        if landmark_source is not None or landmarks_path is None:
+            return
+        
+        staged = not self.video_config.get('save_landmarks', False)
+        if result['success'] and result['frames_failed'] == 0:
+            self.cache.store(self._cache_keys[input_path], landmarks_path, move=staged)
+        elif staged and os.path.exists(landmarks_path):
+            os.remove(landmarks_path)
+    
+    def _schedule(self, planned: List[Tuple]) -> Tuple[List[Tuple], Dict[str, List[Tuple]]]:
+        """同一批次中内容相同且未命中缓存的输入只推理一次，
+        其余副本等第一份完成后再派发，届时直接命中缓存"""
+        if self.cache is None:
+            return planned, {}
+        
+        ready = []
+        deferred: Dict[str, List[Tuple]] = {}
+        for job in planned:
+            key = self._cache_keys[job[0]]
+            if job[4] is None and key in deferred:
+                deferred[key].append(job)
+                continue
+            if job[4] is None:
+                deferred[key] = []
+            ready.append(job)
+        return ready, deferred
+    
+    def run(self, jobs: List[Tuple[str, str]]) -> List[Dict]:
+        planned, results = self.plan(jobs)
+        workers = min(self.workers, len(planned))
+        # 全部命中缓存时只需渲染，不必加载模型
+        render_only = all(job[4] is not None for job in planned)
+        ready, deferred = self._schedule(planned)
+        
+        pbar = tqdm(total=len(planned), desc="Videos", unit="videos",
+                    disable=not self.video_config.get('show_progress', True))
+        
+        def finish(job: Tuple, result: Dict) -> List[Tuple]:
+            if self.cache is not None:
+                self._update_cache(job, result)
+            results.append(result)
+            pbar.update(1)
+            return deferred.pop(self._cache_keys.get(job[0]), [])
+        
+        try:
+            if workers == 1:
+                processor = build_processor(self.mediapipe_config, self.video_config,
+                                            render_only)
+                try:
+                    while ready:
+                        job = self._resolve(ready.pop(0))
+                        ready.extend(finish(job, _process_job(processor, *job)))
+                finally:
+                    _close_processor(processor)
+            elif workers > 1:
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                         initializer=_init_worker,
+                                         initargs=(self.mediapipe_config,
+                                                   self.video_config,
+                                                   render_only)) as pool:
+                    futures = {}
+                    for job in ready:
+                        job = self._resolve(job)
+                        futures[pool.submit(_run_job, *job)] = job
+                    while futures:
+                        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            job = futures.pop(future)
+                            try:
+                                result = future.result()
+                            except Exception as e:
+                                result = _make_result(*job[:3])
+                                result['pid'] = None
+                                result['error'] = f"{type(e).__name__}: {str(e)}"
+                            for waiting in finish(job, result):
+                                waiting = self._resolve(waiting)
+                                futures[pool.submit(_run_job, *waiting)] = waiting
+        finally:
+            pbar.close()
+        
+        order = {job[0]: i for i, job in enumerate(jobs)}
+        results.sort(key=lambda r: order.get(r['input'], 0))
+        return results
@@ -0,0 +1,183 @@
+import json
+import os
+import shutil
+from typing import Dict, List, Optional, Tuple
+from video_processor import VideoProcessor, VideoProcessingError
+from landmark_store import LandmarkStore, sidecar_path_for
+from adaptive_estimator import ComplexityLog, complexity_log_path_for
+from segments import join_segments
+from config import CHECKPOINT_CONFIG
+
+_CHECKPOINT_VERSION = 1
+
+
+def plan_chunks(total_frames: int, chunk_frames: int) -> List[Tuple[int, int]]:
+    chunk_frames = max(1, chunk_frames)
+    return [(start, min(start + chunk_frames, total_frames))
+            for start in range(0, total_frames, chunk_frames)]
+
+
+class CheckpointedProcessor:
+    """
+    可中断、可续跑的长视频处理：视频按固定帧数切成若干块依次处理，每块写成独立的
+    完整文件（无损中间编码）并附带关键点文件，每完成一块就原子地更新检查点。
+    中断后以 resume=True 重新运行时跳过已完成的块，全部完成后拼接为最终输出。
+
+    同一进程内连续处理的块之间跟踪状态自然延续，输出与一次性处理相同；
+    续跑时模型是新建的，第一块从起点前 warmup_frames 帧开始推理以让跟踪收敛。
+    """
+
+    def __init__(self, processor_factory, mediapipe_config: Dict, video_config: Dict,
+                 config: Optional[Dict] = None):
+        self.processor_factory = processor_factory
+        self.mediapipe_config = mediapipe_config
+        self.video_config = video_config
+        self.config = dict(CHECKPOINT_CONFIG, **(config or {}))
+
+    @staticmethod
+    def work_dir_for(output_path: str) -> str:
+        return output_path + '.parts'
+
+    def _fingerprint(self, input_path: str, total_frames: int) -> Dict:
+        """检查点只在输入文件、分块方式与影响输出的参数都未改变时才可续用"""
+        stat = os.stat(input_path)
+        return {
+            'version': _CHECKPOINT_VERSION,
+            'input': os.path.abspath(input_path),
+            'input_size': stat.st_size,
+            'input_mtime': stat.st_mtime,
+            'frame_count': total_frames,
+            'chunk_frames': self.config['chunk_frames'],
+            'mediapipe': self.mediapipe_config,
+            'output_codec': self.video_config['output_codec'],
+            'output_fps': self.video_config['output_fps']
+        }
+
+    def _load_checkpoint(self, path: str, fingerprint: Dict) -> Optional[Dict]:
+        try:
+            with open(path, encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # 经过 JSON 往返后再比较，避免元组与列表之类的差异
+        expected = json.loads(json.dumps(fingerprint, default=str))
+        if checkpoint.get('fingerprint') != expected:
+            return None
+        return checkpoint
+
+    @staticmethod
+    def _save_checkpoint(path: str, checkpoint: Dict):
+        staging = path + '.tmp'
+        with open(staging, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, indent=2, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(staging, path)
+
+    def process_video(self, input_path: str, output_path: str, resume: bool = False) -> bool:
+        info = VideoProcessor.get_video_info(input_path)
+        if info is None:
+            print(f"Error: Cannot open video file: {input_path}")
+            return False
+
+        total_frames = info['frame_count']
+        plan = plan_chunks(total_frames, self.config['chunk_frames'])
+        if not plan:
+            print(f"Error: Video has no frames: {input_path}")
+            return False
+
+        work_dir = self.work_dir_for(output_path)
+        checkpoint_path = os.path.join(work_dir, 'checkpoint.json')
+        fingerprint = self._fingerprint(input_path, total_frames)
+
+        checkpoint = None
+        if os.path.isdir(work_dir):
+            if resume:
+                checkpoint = self._load_checkpoint(checkpoint_path, fingerprint)
+                if checkpoint is None:
+                    print("Checkpoint does not match the current input or settings, starting over")
+            else:
+                print(f"Discarding previous checkpoint in {work_dir}")
+            if checkpoint is None:
+                shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir, exist_ok=True)
+        if checkpoint is None:
+            checkpoint = {'fingerprint': fingerprint, 'chunks': {}}
+
+        chunk_paths = [os.path.join(work_dir, f"chunk_{i:05d}.avi") for i in range(len(plan))]
+        done = checkpoint['chunks']
+
+        print(f"\nVideo information:")
+        print(f"  Resolution: {info['width']}x{info['height']}")
+        print(f"  Frame rate: {info['fps']:.2f} FPS")
+        print(f"  Total frames: {total_frames}")
+        print(f"  Chunks: {len(plan)} x {self.config['chunk_frames']} frames "
+              f"({len(done)} already done)\n")
+
+        processor = None
+        continuous = False
+        try:
+            for i, (start, end) in enumerate(plan):
+                if str(i) in done:
+                    continuous = False
+                    continue
+
+                if processor is None:
+                    processor = self.processor_factory()
+                warmup = 0 if continuous or start == 0 else self.config['warmup_frames']
+                stats = processor.run_video(
+                    input_path, chunk_paths[i], frame_range=(start, end), warmup=warmup,
+                    codec=self.config['intermediate_codec'],
+                    landmarks_path=sidecar_path_for(chunk_paths[i])
+                )
+                continuous = True
+
+                done[str(i)] = {'start': start, 'end': end,
+                                'success': stats['success'], 'fail': stats['fail']}
+                self._save_checkpoint(checkpoint_path, checkpoint)
+                print(f"  Chunk {i + 1}/{len(plan)} done (frames {start + 1}-{end}), "
+                      f"checkpoint saved")
+
+            output_fps = self.video_config['output_fps'] or info['fps']
+            written = join_segments(chunk_paths, output_path, output_fps,
+                                    (info['width'], info['height']),
+                                    self.video_config)
+
+            landmarks_path = None
+            if self.video_config.get('save_landmarks', False):
+                landmarks_path = sidecar_path_for(output_path)
+                LandmarkStore.concatenate([sidecar_path_for(path) for path in chunk_paths],
+                                          landmarks_path)
+
+            complexity_log = None
+            chunk_logs = [complexity_log_path_for(path) for path in chunk_paths]
+            if all(os.path.exists(path) for path in chunk_logs):
+                complexity_log = complexity_log_path_for(output_path)
+                ComplexityLog.concatenate(chunk_logs, complexity_log)
+        except VideoProcessingError as e:
+            print(f"Error: {str(e)}")
+            print(f"Completed chunks are kept in {work_dir}; rerun with --resume to continue")
+            return False
+        except KeyboardInterrupt:
+            print(f"\nInterrupted: {len(done)}/{len(plan)} chunks saved in {work_dir}; "
+                  f"rerun with --resume to continue")
+            return False
+
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+        success = sum(chunk['success'] for chunk in done.values())
+        fail = sum(chunk['fail'] for chunk in done.values())
+        print(f"\nProcessing completed")
+        print(f"  Successfully processed: {success} frames")
+        if fail > 0:
+            print(f"  Failed: {fail} frames")
+        if written != total_frames:
+            print(f"  Warning: output has {written} frames, input reports {total_frames}")
+        print(f"  Output file: {output_path}")
+        if landmarks_path:
+            print(f"  Landmarks file: {landmarks_path}")
+        if complexity_log:
+            print(f"  Complexity log: {complexity_log}")
+        print()
+
+        return True
@@ -14,6 +14,40 @@ MEDIAPIPE_CONFIG = {
     'min_tracking_confidence': 0.5
 }
 
+# 推理分辨率：送入 MediaPipe 前把帧等比缩小（只缩小不放大），两项同时设置时取更小的结果。
+# 跟踪裁剪：按上一帧关键点包围盒加边距裁剪下一帧，跟丢时退回整帧。
+# 关键帧间隔：每 keyframe_stride 帧推理一次，中间帧插值；adaptive_stride 时按动作幅度
+# 在 1 到 keyframe_stride 之间调整间隔，阈值为每帧关键点位移（归一化坐标）。
+# 自适应复杂度：给出 target_fps 或 latency_budget_ms（推理耗时预算）时，运行中在
+# complexity 0/1/2 之间切换，见 ADAPTIVE_CONFIG。
+# 这些参数由 PoseEstimator 自行处理，不会传给 mp.solutions.pose.Pose
+INFERENCE_CONFIG = {
+    'inference_max_side': None,
+    'inference_scale': None,
+    'roi_tracking': False,
+    'roi_margin': 0.3,
+    'roi_min_size': 0.2,
+    'keyframe_stride': 1,
+    'adaptive_stride': False,
+    'stride_motion_threshold': 0.01,
+    'target_fps': None,
+    'latency_budget_ms': None
+}
+
+# 自适应复杂度控制器参数：
+# 推理耗时（指数滑动平均）超出预算时降一级；平均可见度低于 low_visibility 且上一级的预计耗时
+# 不超过预算的 headroom 倍时升一级；可见度高于 high_visibility 时降一级以节省算力。
+# 除超预算降级外，两次切换之间至少间隔 min_dwell_frames 帧
+ADAPTIVE_CONFIG = {
+    'complexities': (0, 1, 2),
+    'low_visibility': 0.6,
+    'high_visibility': 0.85,
+    'headroom': 0.8,
+    'min_dwell_frames': 30,
+    'settle_frames': 5,
+    'ema_alpha': 0.1
+}
+
 VISUALIZATION_CONFIG = {
     'skeleton_color': (0, 255, 0),
     'skeleton_thickness': 2,
@@ -25,7 +59,9 @@ VISUALIZATION_CONFIG = {
     'text_thickness': 1,
     'angle_color': (255, 255, 0),
     'angle_arc_radius': 30,
-    'info_box_alpha': 0.7
+    'info_box_alpha': 0.7,
+    # 文字精灵缓存可容纳的字符串数，需大于全部角度标注的 1801 种；0 表示不缓存、每帧直接调用 cv2.putText
+    'text_cache_size': 4096
 }
 ANGLES_TO_DISPLAY = [
     {'name': '左肘角度', 'points': ['LEFT_SHOULDER', 'LEFT_ELBOW', 'LEFT_WRIST'], 'position': 'LEFT_ELBOW'},
@@ -36,6 +72,18 @@ ANGLES_TO_DISPLAY = [
     {'name': '右肩角度', 'points': ['RIGHT_ELBOW', 'RIGHT_SHOULDER', 'RIGHT_HIP'], 'position': 'RIGHT_SHOULDER'}
 ]
 
+# 与 mediapipe PoseLandmark 枚举顺序一致，供不加载 MediaPipe 的场景（如仅渲染）使用
+LANDMARK_NAMES = [
+    'NOSE', 'LEFT_EYE_INNER', 'LEFT_EYE', 'LEFT_EYE_OUTER',
+    'RIGHT_EYE_INNER', 'RIGHT_EYE', 'RIGHT_EYE_OUTER', 'LEFT_EAR', 'RIGHT_EAR',
+    'MOUTH_LEFT', 'MOUTH_RIGHT', 'LEFT_SHOULDER', 'RIGHT_SHOULDER',
+    'LEFT_ELBOW', 'RIGHT_ELBOW', 'LEFT_WRIST', 'RIGHT_WRIST',
+    'LEFT_PINKY', 'RIGHT_PINKY', 'LEFT_INDEX', 'RIGHT_INDEX',
+    'LEFT_THUMB', 'RIGHT_THUMB', 'LEFT_HIP', 'RIGHT_HIP',
+    'LEFT_KNEE', 'RIGHT_KNEE', 'LEFT_ANKLE', 'RIGHT_ANKLE',
+    'LEFT_HEEL', 'RIGHT_HEEL', 'LEFT_FOOT_INDEX', 'RIGHT_FOOT_INDEX'
+]
+
 POSE_CONNECTIONS = [
     ('LEFT_SHOULDER', 'RIGHT_SHOULDER'),
     ('LEFT_SHOULDER', 'LEFT_HIP'),
@@ -69,6 +117,77 @@ POSE_CONNECTIONS = [
 VIDEO_CONFIG = {
     'output_fps': None,
     'output_codec': 'mp4v',
-    'show_progress': True
+    'show_progress': True,
+    'pipeline': False,
+    'queue_size': 8,
+    'save_landmarks': False,
+    'headless': False,
+    'analytics_format': 'csv',
+    # 编码后端：'opencv' 使用 cv2.VideoWriter 与 output_codec (FourCC)；'ffmpeg' 把原始帧经管道送入
+    # 外部编码器进程，使用下面的编码器、preset、CRF 与线程数 (0=自动)，找不到 ffmpeg 时回退到 OpenCV
+    'encoder': 'opencv',
+    'ffmpeg_binary': 'ffmpeg',
+    'ffmpeg_codec': 'libx264',
+    'ffmpeg_preset': 'veryfast',
+    'ffmpeg_crf': 23,
+    'ffmpeg_threads': 0,
+    'ffmpeg_pix_fmt': 'yuv420p'
 }
 
+
+# 多路输出：除主输出外的每一路在独立线程中缩放、抽帧并编码，队列满时主输出等待，在途帧数因此有上限；
+# 扩展名为图片的输出拼成缩略图条，每行 strip_columns 张
+RENDITION_CONFIG = {
+    'queue_size': 8,
+    'strip_columns': 10
+}
+
+
+# 实时流：采集队列满时丢弃最旧的帧；处理时丢弃等待过久的帧，使端到端延迟不超过 max_latency_ms。
+# size/fps 用于标准输入的原始帧和合成测试画面（摄像头与网络流从流本身读取）
+STREAM_CONFIG = {
+    'capture_queue': 4,
+    'max_latency_ms': 200,
+    'size': (640, 480),
+    'fps': 30.0
+}
+
+
+# 常驻服务：在途请求（排队+执行中）达到 max_pending 时返回 503
+SERVICE_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 8765,
+    'max_pending': 32,
+    'max_body_mb': 64,
+    'jpeg_quality': 90
+}
+
+
+BATCH_CONFIG = {
+    'workers': 1
+}
+
+CACHE_CONFIG = {
+    'enabled': True,
+    'cache_dir': os.path.join(_PROJECT_ROOT, ".cache", "landmarks"),
+    'max_size_mb': 1024
+}
+
+SEGMENT_CONFIG = {
+    'warmup_frames': 30,
+    'min_segment_frames': 300,
+    'intermediate_codec': 'FFV1'
+}
+
+CHECKPOINT_CONFIG = {
+    'chunk_frames': 1800,
+    'warmup_frames': 30,
+    'intermediate_codec': 'FFV1'
+}
+
+INDEX_CONFIG = {
+    'index_dir': os.path.join(_PROJECT_ROOT, ".cache", "angle_index"),
+    # 金字塔每层把上一层的 8 个块合并为一块：第 1 层每块 8 帧，第 2 层 64 帧，依此类推
+    'pyramid_factor': 8,
+    'build_chunk_frames': 4096
+}
@@ -0,0 +1,66 @@
+import numpy as np
+from typing import List, Optional
+from pose_estimator import VISIBILITY_THRESHOLD
+
+
+def interpolate_landmarks(start: Optional[np.ndarray], end: Optional[np.ndarray],
+                          count: int) -> List[Optional[np.ndarray]]:
+    """
+    在两个关键帧之间插值出 count 帧的关键点 (33, 4)。
+    x/y/z 线性插值；可见度在两端都可见时线性插值，任一端不可见时取两端较小值，
+    避免被遮挡的点在中间帧里“滑入”画面。某一端没有检测到人体时按最近的关键帧取值。
+    """
+    if count <= 0:
+        return []
+
+    t = np.arange(1, count + 1, dtype=np.float32) / (count + 1)
+    if start is None or end is None:
+        return [start if ti < 0.5 else end for ti in t]
+
+    t = t[:, None, None]
+    frames = (1.0 - t) * start + t * end
+
+    hidden = (start[:, 3] < VISIBILITY_THRESHOLD) | (end[:, 3] < VISIBILITY_THRESHOLD)
+    frames[:, hidden, 3] = np.minimum(start[hidden, 3], end[hidden, 3])
+    return list(frames)
+
+
+def landmark_motion(start: Optional[np.ndarray], end: Optional[np.ndarray]) -> Optional[float]:
+    """两帧之间两端都可见的关键点位移（归一化坐标）的 90 分位数；无法比较时返回 None"""
+    if start is None or end is None:
+        return None
+
+    visible = (start[:, 3] >= VISIBILITY_THRESHOLD) & (end[:, 3] >= VISIBILITY_THRESHOLD)
+    if not visible.any():
+        return None
+
+    displacement = np.linalg.norm(end[visible, :2] - start[visible, :2], axis=1)
+    return float(np.percentile(displacement, 90))
+
+
+class KeyframeScheduler:
+    """
+    决定下一个关键帧的间隔。固定模式始终使用 max_stride；自适应模式下
+    相邻关键帧之间的每帧运动量超过阈值时间隔减半，低于阈值一半时加倍，范围 [1, max_stride]。
+    """
+
+    def __init__(self, max_stride: int, adaptive: bool = False,
+                 motion_threshold: float = 0.01):
+        self.max_stride = max(1, max_stride)
+        self.adaptive = adaptive
+        self.motion_threshold = motion_threshold
+        self.stride = self.max_stride
+
+    def update(self, start: Optional[np.ndarray], end: Optional[np.ndarray], gap: int):
+        if not self.adaptive:
+            return
+
+        motion = landmark_motion(start, end)
+        if motion is None:
+            return
+
+        per_frame = motion / max(1, gap)
+        if per_frame > self.motion_threshold:
+            self.stride = max(1, self.stride // 2)
+        elif per_frame < self.motion_threshold / 2:
+            self.stride = min(self.max_stride, self.stride * 2)
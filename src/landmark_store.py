@@ -0,0 +1,107 @@
+import os
+import struct
+import numpy as np
+from typing import List, Optional
+
+
+SIDECAR_EXTENSION = '.pose'
+
+_MAGIC = b'POSESIM\x01'
+_HEADER = struct.Struct('<8sIIQdII')
+_HEADER_SIZE = 64
+
+
+def sidecar_path_for(video_path: str) -> str:
+    return os.path.splitext(video_path)[0] + SIDECAR_EXTENSION
+
+
+class LandmarkStoreWriter:
+    """
+    逐帧写入关键点数据的列式文件：
+    64 字节文件头 | landmarks 列 float32 (帧数, 33, 4) | detected 列 uint8 (帧数,)
+    landmarks 列边处理边追加写盘，detected 列在关闭时追加并回填文件头中的帧数。
+    """
+
+    def __init__(self, path: str, fps: float, width: int, height: int,
+                 num_landmarks: int = 33):
+        self.path = path
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.num_landmarks = num_landmarks
+        self._empty = np.zeros((num_landmarks, 4), dtype=np.float32)
+        self._detected = bytearray()
+
+        self._file = open(path, 'wb')
+        self._write_header(0)
+
+    def _write_header(self, num_frames: int):
+        header = _HEADER.pack(_MAGIC, 1, self.num_landmarks, num_frames,
+                              self.fps, self.width, self.height)
+        self._file.seek(0)
+        self._file.write(header.ljust(_HEADER_SIZE, b'\0'))
+
+    def append(self, landmarks: Optional[np.ndarray]):
+        if landmarks is None:
+            self._file.write(self._empty.tobytes())
+            self._detected.append(0)
+        else:
+            self._file.write(np.ascontiguousarray(landmarks, dtype=np.float32).tobytes())
+            self._detected.append(1)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.write(bytes(self._detected))
+        self._write_header(len(self._detected))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LandmarkStore:
+    """只读打开关键点列式文件，两列均以内存映射方式访问，不整体读入内存"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER_SIZE)
+        if len(header) < _HEADER_SIZE or header[:8] != _MAGIC:
+            raise ValueError(f"Not a landmark sidecar file: {path}")
+
+        (_, self.version, self.num_landmarks, self.num_frames,
+         self.fps, self.width, self.height) = _HEADER.unpack_from(header)
+
+        if self.num_frames > 0:
+            self.landmarks = np.memmap(path, dtype=np.float32, mode='r',
+                                       offset=_HEADER_SIZE,
+                                       shape=(self.num_frames, self.num_landmarks, 4))
+            detected_offset = _HEADER_SIZE + self.landmarks.nbytes
+            self.detected = np.memmap(path, dtype=np.uint8, mode='r',
+                                      offset=detected_offset,
+                                      shape=(self.num_frames,)).view(bool)
+        else:
+            self.landmarks = np.zeros((0, self.num_landmarks, 4), dtype=np.float32)
+            self.detected = np.zeros(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return self.num_frames
+
+    def get(self, index: int) -> Optional[np.ndarray]:
+        if index < 0 or index >= self.num_frames or not self.detected[index]:
+            return None
+        return np.asarray(self.landmarks[index])
+
+    @staticmethod
+    def concatenate(paths: List[str], output_path: str):
+        stores = [LandmarkStore(path) for path in paths]
+        first = stores[0]
+        with LandmarkStoreWriter(output_path, first.fps, first.width, first.height,
+                                 first.num_landmarks) as writer:
+            for store in stores:
+                for index in range(len(store)):
+                    writer.append(store.get(index))
@@ -2,10 +2,10 @@ import os
 import sys
 import argparse
 from pathlib import Path
-from pose_estimator import PoseEstimator
-from visualizer import PoseVisualizer
-from video_processor import VideoProcessor
-from config import INPUT_DIR, OUTPUT_DIR
+# cv2/mediapipe 等重量级模块只在实际执行的命令中导入，--help、参数错误、输入不存在时无需加载
+from config import (INPUT_DIR, OUTPUT_DIR, MEDIAPIPE_CONFIG, VIDEO_CONFIG, BATCH_CONFIG,
+                    CACHE_CONFIG, INFERENCE_CONFIG, STREAM_CONFIG, SERVICE_CONFIG,
+                    CHECKPOINT_CONFIG, INDEX_CONFIG)
 
 
 def parse_arguments():
@@ -21,8 +21,71 @@ def parse_arguments():
   # 处理input文件夹下的所有视频
   python main.py --batch
   
+  # 使用4个工作进程并行批量处理
+  python main.py --batch --workers 4
+  
+  # 查看或清空批处理结果缓存
+  python main.py --cache-list
+  python main.py --cache-clear
+  
   # 指定MediaPipe模型复杂度（0=最快，1=平衡，2=最准）
   python main.py -i input/video.mp4 -o output/result.mp4 --complexity 1
+  
+  # 将长视频切成8段并行处理
+  python main.py -i input/long.mp4 -o output/long_pose.mp4 --segments 8
+  
+  # 长视频分块处理并保存检查点；中断后加 --resume 从上次完成的块继续
+  python main.py -i input/long.mp4 -o output/long_pose.mp4 --checkpoint
+  python main.py -i input/long.mp4 -o output/long_pose.mp4 --resume
+  
+  # 用 ffmpeg 直接编码为 H.264，免去再次转码；未安装 ffmpeg 时回退到 OpenCV
+  python main.py -i input/video.mp4 -o output/result.mp4 --encoder ffmpeg --preset fast --crf 20
+  
+  # 一次推理同时输出全分辨率视频、480p 预览（隔帧）和缩略图条（每 2 秒一张，不绘制骨架）
+  python main.py -i input/video.mp4 -o output/result.mp4 --rendition output/preview.mp4,height=480,every=2 --rendition output/thumbs.jpg,width=160,every=60,overlay=0
+  
+  # 流水线模式：解码、推理、渲染、编码并行执行
+  python main.py -i input/video.mp4 -o output/result.mp4 --pipeline
+  
+  # 仅分析模式：不渲染、不编码，只输出每帧关键点与关节角度表
+  python main.py -i input/video.mp4 -o output/video_angles.csv --headless
+  
+  # 4K 视频缩小到最长边 960 像素再推理，骨架仍绘制在原分辨率画面上
+  python main.py -i input/4k.mp4 -o output/4k_pose.mp4 --inference-max-side 960
+  
+  # 人物只占画面一小部分时，按上一帧人体区域裁剪后再推理
+  python main.py -i input/wide.mp4 -o output/wide_pose.mp4 --roi-tracking
+  
+  # 120/240fps 高帧率视频每4帧推理一次，中间帧插值；动作剧烈时自动缩短间隔
+  python main.py -i input/slowmo.mp4 -o output/slowmo_pose.mp4 --stride 4 --adaptive-stride
+  
+  # 自适应复杂度：保证推理达到 25 FPS，在 complexity 0/1/2 之间自动切换，逐帧记录所用复杂度
+  python main.py -i input/video.mp4 -o output/result.mp4 --target-fps 25
+  
+  # 实时流：摄像头 0 显示在窗口中；RTSP 流写入文件；合成画面用于本地测试
+  python main.py --stream 0 -o display --complexity 0
+  python main.py --stream rtsp://camera/live -o output/live.mp4 --max-latency 150
+  python main.py --stream synthetic -o output/synthetic.mp4 --max-frames 300
+  
+  # 标准输入/输出原始帧，可与 ffmpeg/ffplay 串联
+  ffmpeg -i input.mp4 -f rawvideo -pix_fmt bgr24 - | python main.py --stream - --stream-size 1280x720 -o - | ffplay -f rawvideo -pixel_format bgr24 -video_size 1280x720 -
+  
+  # 常驻服务：2 个工作进程各自常驻模型，通过 HTTP 提交单帧或视频任务
+  python main.py --serve --workers 2 --complexity 1
+  curl --data-binary @frame.jpg http://127.0.0.1:8765/v1/frame
+  curl http://127.0.0.1:8765/v1/metrics
+  
+  # 输出各阶段耗时报告（均值、p50/p95/p99、占比），并保存为JSON
+  python main.py -i input/video.mp4 -o output/result.mp4 --profile --profile-json profile.json
+  
+  # 保存关键点数据（输出 output/result.pose），之后只重新渲染而不再推理
+  python main.py -i input/video.mp4 -o output/result.mp4 --save-landmarks
+  python main.py -i input/video.mp4 -o output/restyled.mp4 --render-from output/result.pose
+  
+  # 为 output 下所有 .pose 文件建立角度索引，查询左膝角度低于 90° 且持续 0.5 秒以上的片段
+  python main.py --index-build output
+  python main.py --index-query "LEFT_KNEE<90" --min-duration 0.5
+  python main.py --index-query "80<左膝角度<120" --min-duration 1
         """
     )
     
@@ -36,10 +99,144 @@ def parse_arguments():
                        help='MediaPipe模型复杂度 (0=快速, 1=平衡, 2=精确)')
     parser.add_argument('--confidence', type=float, default=0.5,
                        help='姿态检测最小置信度 (0.0-1.0)')
+    parser.add_argument('--inference-max-side', type=int,
+                       help='推理前把帧等比缩小到最长边不超过该像素数（渲染仍为原分辨率）')
+    parser.add_argument('--inference-scale', type=float,
+                       help='推理前把帧按该比例缩小 (0-1)，渲染仍为原分辨率')
+    parser.add_argument('--roi-tracking', action='store_true',
+                       help='跟踪裁剪：用上一帧人体包围盒裁剪下一帧再推理，跟丢时退回整帧')
+    parser.add_argument('--stride', type=int, metavar='N',
+                       help='关键帧间隔：每N帧推理一次，中间帧由前后关键帧插值（适合高帧率视频）')
+    parser.add_argument('--adaptive-stride', action='store_true',
+                       help='按动作幅度自动调整关键帧间隔（上限为 --stride）')
+    parser.add_argument('--target-fps', type=float,
+                       help='自适应复杂度：按目标推理帧率在 complexity 0/1/2 之间自动切换')
+    parser.add_argument('--latency-budget', type=float, metavar='MS',
+                       help='自适应复杂度：每帧推理耗时预算（毫秒），优先于 --target-fps')
+    parser.add_argument('--stream', type=str, metavar='SOURCE',
+                       help='实时流模式：摄像头编号、RTSP/HTTP地址、- (标准输入原始BGR帧) 或 synthetic；'
+                            '-o 可为文件、- (标准输出) 或 display')
+    parser.add_argument('--stream-size', type=str, metavar='WxH',
+                       help='标准输入/合成画面的分辨率 (默认640x480)')
+    parser.add_argument('--stream-fps', type=float,
+                       help='标准输入/合成画面的帧率 (默认30)')
+    parser.add_argument('--max-latency', type=float, default=STREAM_CONFIG['max_latency_ms'],
+                       metavar='MS', help='实时流的端到端延迟上限，超出时丢弃旧帧 (默认200毫秒)')
+    parser.add_argument('--max-frames', type=int,
+                       help='实时流模式下采集N帧后停止')
+    parser.add_argument('--serve', action='store_true',
+                       help='启动常驻的姿态估计服务 (HTTP)，模型在工作进程中常驻')
+    parser.add_argument('--host', type=str, default=SERVICE_CONFIG['host'],
+                       help='服务监听地址 (默认127.0.0.1)')
+    parser.add_argument('--port', type=int, default=SERVICE_CONFIG['port'],
+                       help='服务监听端口 (默认8765)')
+    parser.add_argument('--socket', type=str, metavar='PATH',
+                       help='改为监听Unix套接字')
+    parser.add_argument('--max-pending', type=int, default=SERVICE_CONFIG['max_pending'],
+                       help='服务的在途请求上限，超出时返回503 (默认32)')
+    parser.add_argument('--workers', type=int, default=BATCH_CONFIG['workers'],
+                       help='批量模式的并行工作进程数 (0=使用全部CPU核心)')
+    parser.add_argument('--segments', type=int, default=0,
+                       help='将单个视频切分为N段并用N个进程并行处理')
+    parser.add_argument('--checkpoint', action='store_true',
+                       help='分块处理单个视频，每完成一块保存检查点，可中断后续跑')
+    parser.add_argument('--resume', action='store_true',
+                       help='从上次的检查点继续，跳过已完成的块（隐含 --checkpoint）')
+    parser.add_argument('--chunk-frames', type=int, default=CHECKPOINT_CONFIG['chunk_frames'],
+                       help='检查点模式下每块的帧数 (默认1800)')
+    parser.add_argument('--pipeline', action='store_true',
+                       help='启用流水线模式（解码/推理/渲染/编码分线程并行）')
+    parser.add_argument('--queue-size', type=int, default=VIDEO_CONFIG['queue_size'],
+                       help='流水线各级之间的队列长度')
+    parser.add_argument('--encoder', choices=['opencv', 'ffmpeg'], default=VIDEO_CONFIG['encoder'],
+                       help='视频编码后端：opencv (cv2.VideoWriter) 或 ffmpeg (原始帧经管道送入外部编码器)')
+    parser.add_argument('--ffmpeg-codec', type=str, default=VIDEO_CONFIG['ffmpeg_codec'],
+                       help='ffmpeg 编码器 (默认libx264)')
+    parser.add_argument('--preset', type=str, default=VIDEO_CONFIG['ffmpeg_preset'],
+                       help='ffmpeg 编码 preset (默认veryfast)')
+    parser.add_argument('--crf', type=int, default=VIDEO_CONFIG['ffmpeg_crf'],
+                       help='ffmpeg 编码质量 CRF，越小质量越高 (默认23)')
+    parser.add_argument('--encoder-threads', type=int, default=VIDEO_CONFIG['ffmpeg_threads'],
+                       help='ffmpeg 编码线程数 (默认0=自动)')
+    parser.add_argument('--rendition', type=str, action='append', metavar='SPEC',
+                       help='附加输出，可重复：PATH[,width=W][,height=H][,scale=S][,every=N]'
+                            '[,codec=FOURCC][,overlay=0|1]，与主输出共用一次推理')
+    parser.add_argument('--save-landmarks', action='store_true',
+                       help='在输出视频旁保存关键点数据文件 (.pose)')
+    parser.add_argument('--render-from', type=str, metavar='POSE_FILE',
+                       help='仅渲染模式：使用已保存的关键点文件绘制，不加载模型')
+    parser.add_argument('--headless', action='store_true',
+                       help='仅分析模式：输出每帧关键点与角度表 (.csv/.parquet)，不生成视频')
+    parser.add_argument('--profile', action='store_true',
+                       help='统计解码/转换/推理/绘制/编码各阶段耗时并输出报告')
+    parser.add_argument('--profile-json', type=str, metavar='PATH',
+                       help='同时把性能报告写入JSON文件（隐含 --profile）')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='批量模式下不读写关键点结果缓存')
+    parser.add_argument('--cache-list', action='store_true',
+                       help='列出结果缓存中的条目')
+    parser.add_argument('--cache-clear', action='store_true',
+                       help='清空结果缓存')
+    parser.add_argument('--index-build', type=str, nargs='*', metavar='PATH',
+                       help='为 .pose 文件或目录（递归）建立多分辨率角度索引 (默认output目录)')
+    parser.add_argument('--index-query', type=str, metavar='EXPR',
+                       help="在角度索引中查询，如 'LEFT_KNEE<90'、'80<LEFT_KNEE<120'")
+    parser.add_argument('--min-duration', type=float, default=0.0,
+                       help='查询结果的最短持续时间（秒，默认0）')
+    parser.add_argument('--index-dir', type=str, default=INDEX_CONFIG['index_dir'],
+                       help='角度索引目录')
     
     return parser.parse_args()
 
 
+def build_mediapipe_config(complexity: int, confidence: float,
+                           inference: dict = None) -> dict:
+    config = MEDIAPIPE_CONFIG.copy()
+    config['model_complexity'] = complexity
+    config['min_detection_confidence'] = confidence
+    config['min_tracking_confidence'] = confidence
+    config.update(inference or {})
+    return config
+
+
+def build_inference_config(args) -> dict:
+    config = INFERENCE_CONFIG.copy()
+    if args.inference_max_side:
+        config['inference_max_side'] = args.inference_max_side
+    if args.inference_scale:
+        config['inference_scale'] = args.inference_scale
+    config['roi_tracking'] = args.roi_tracking or config['roi_tracking']
+    if args.stride:
+        config['keyframe_stride'] = args.stride
+    config['adaptive_stride'] = args.adaptive_stride or config['adaptive_stride']
+    if args.target_fps:
+        config['target_fps'] = args.target_fps
+    if args.latency_budget:
+        config['latency_budget_ms'] = args.latency_budget
+    return config
+
+
+def build_video_config(args) -> dict:
+    config = VIDEO_CONFIG.copy()
+    config['pipeline'] = args.pipeline or config['pipeline']
+    config['queue_size'] = args.queue_size
+    config['save_landmarks'] = args.save_landmarks or config['save_landmarks']
+    config['headless'] = args.headless or config['headless']
+    config['encoder'] = args.encoder
+    config['ffmpeg_codec'] = args.ffmpeg_codec
+    config['ffmpeg_preset'] = args.preset
+    config['ffmpeg_crf'] = args.crf
+    config['ffmpeg_threads'] = args.encoder_threads
+    return config
+
+
+def table_path_for(output_path: str, video_config: dict) -> str:
+    name, ext = os.path.splitext(output_path)
+    if ext.lower() in ('.csv', '.parquet'):
+        return output_path
+    return f"{name}.{video_config['analytics_format']}"
+
+
 def ensure_directories():
     os.makedirs(INPUT_DIR, exist_ok=True)
     os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -57,29 +254,119 @@ def get_video_files(directory: str) -> list:
 
 
 def process_single_video(input_path: str, output_path: str, 
-                        complexity: int = 2, confidence: float = 0.5):
+                        complexity: int = 2, confidence: float = 0.5,
+                        video_config: dict = None, segments: int = 0,
+                        render_from: str = None, profile: bool = False,
+                        profile_json: str = None, inference_config: dict = None,
+                        checkpoint: bool = False, resume: bool = False,
+                        chunk_frames: int = None, renditions: list = None):
     print("="*60)
     print("Pose Estimation and Visualization System")
     print("="*60)
     print(f"\nInput file: {input_path}")
     print(f"Output file: {output_path}")
+    for spec in renditions or []:
+        print(f"Rendition: {spec}")
     print(f"Model complexity: {complexity}")
     print(f"Detection confidence: {confidence}")
+    if inference_config and inference_config['inference_max_side']:
+        print(f"Inference max side: {inference_config['inference_max_side']}")
+    if inference_config and inference_config['inference_scale']:
+        print(f"Inference scale: {inference_config['inference_scale']}")
+    if inference_config and inference_config['roi_tracking']:
+        print("ROI tracking: enabled")
+    if inference_config and inference_config['keyframe_stride'] > 1:
+        adaptive = " (adaptive)" if inference_config['adaptive_stride'] else ""
+        print(f"Keyframe stride: {inference_config['keyframe_stride']}{adaptive}")
+    if inference_config and inference_config['latency_budget_ms']:
+        print(f"Adaptive complexity: {inference_config['latency_budget_ms']:g} ms per frame")
+    elif inference_config and inference_config['target_fps']:
+        print(f"Adaptive complexity: target {inference_config['target_fps']:g} FPS")
+    
+    # 先检查输入，再加载模型
+    error = None
+    if not os.path.exists(input_path):
+        error = f"Input video file does not exist: {input_path}"
+    elif render_from and not os.path.exists(render_from):
+        error = f"Landmarks file does not exist: {render_from}"
+    elif renditions and (segments > 1 or checkpoint or resume or
+                         (video_config and video_config['headless'])):
+        error = "--rendition cannot be combined with --segments, --checkpoint or --headless"
+    else:
+        from renditions import parse_rendition
+        from video_processor import VideoProcessor
+        try:
+            renditions = [parse_rendition(spec) for spec in renditions or []]
+        except ValueError as e:
+            error = str(e)
+        else:
+            if VideoProcessor.get_video_info(input_path) is None:
+                error = f"Cannot open video file: {input_path}"
+    if error is not None:
+        print(f"\nError: {error}")
+        print("Processing failed")
+        print("="*60)
+        return False
     
     print("\nInitializing system")
-    from config import MEDIAPIPE_CONFIG
+    from adaptive_estimator import shared_estimator
+    from visualizer import PoseVisualizer
+    config = build_mediapipe_config(complexity, confidence, inference_config)
     
-    config = MEDIAPIPE_CONFIG.copy()
-    config['model_complexity'] = complexity
-    config['min_detection_confidence'] = confidence
-    config['min_tracking_confidence'] = confidence
+    video_config = video_config or VIDEO_CONFIG
+    profiler = None
+    if profile or profile_json:
+        from profiler import StageProfiler
+        profiler = StageProfiler()
     
-    estimator = PoseEstimator(config)
-    visualizer = PoseVisualizer(estimator)
-    processor = VideoProcessor(estimator, visualizer)
+    if video_config['headless']:
+        estimator = shared_estimator(config)
+        processor = VideoProcessor(estimator, None, video_config, profiler)
+        
+        print("Analyzing video (headless)")
+        success = processor.analyze_video(input_path, table_path_for(output_path, video_config))
+    elif render_from:
+        visualizer = PoseVisualizer()
+        processor = VideoProcessor(None, visualizer, video_config, profiler)
+        
+        print(f"Rendering from landmarks file: {render_from}")
+        success = processor.process_video(input_path, output_path,
+                                          landmark_source=render_from, renditions=renditions)
+    elif checkpoint or resume:
+        from checkpoint import CheckpointedProcessor
+        
+        def make_processor():
+            estimator = shared_estimator(config)
+            return VideoProcessor(estimator, PoseVisualizer(estimator), video_config, profiler)
+        
+        processor = CheckpointedProcessor(make_processor, config, video_config,
+                                          {'chunk_frames': chunk_frames or
+                                           CHECKPOINT_CONFIG['chunk_frames']})
+        print("Resuming from checkpoint" if resume else "Processing video with checkpoints")
+        success = processor.process_video(input_path, output_path, resume)
+    elif segments > 1:
+        from segments import SegmentProcessor
+        
+        processor = SegmentProcessor(config, video_config, segments)
+        print("Processing video in segments")
+        success = processor.process_video(input_path, output_path, segments)
+    else:
+        estimator = shared_estimator(config)
+        visualizer = PoseVisualizer(estimator)
+        processor = VideoProcessor(estimator, visualizer, video_config, profiler)
+        
+        print("Processing video")
+        success = processor.process_video(input_path, output_path, renditions=renditions)
     
-    print("Processing video")
-    success = processor.process_video(input_path, output_path)
+    if profiler is not None and profiler.frames > 0:
+        summary = profiler.summary()
+        print("Stage timing")
+        print("-"*60)
+        print(profiler.report(summary))
+        print("-"*60)
+        if profile_json:
+            profiler.save_json(profile_json, summary)
+            print(f"Profile saved to: {profile_json}")
     
     if success:
         print("Processing completed successfully")
@@ -91,7 +378,154 @@ def process_single_video(input_path: str, output_path: str,
         return False
 
 
-def batch_process(complexity: int = 2, confidence: float = 0.5):
+def open_cache():
+    from result_cache import ResultCache
+    
+    return ResultCache(CACHE_CONFIG['cache_dir'],
+                       CACHE_CONFIG['max_size_mb'] * 1024 * 1024)
+
+
+def manage_cache(list_entries: bool, clear: bool):
+    cache = open_cache()
+    
+    if list_entries:
+        entries = cache.entries()
+        total = sum(entry['size'] for entry in entries)
+        print(f"Cache directory: {cache.cache_dir}")
+        print(f"Entries: {len(entries)}, {total / 1024 / 1024:.1f} MB "
+              f"(limit {CACHE_CONFIG['max_size_mb']} MB)")
+        for entry in entries:
+            print(f"  {entry['key'][:16]}  {entry['size'] / 1024:10.1f} KB  "
+                  f"last used {cache.format_time(entry['last_used'])}")
+    
+    if clear:
+        removed = cache.clear()
+        print(f"Removed {removed} cache entries")
+
+
+def build_index(paths: list, index_dir: str):
+    from angle_index import AngleIndex
+    
+    index = AngleIndex(index_dir)
+    print(f"Index directory: {index_dir}")
+    result = index.build(paths or [OUTPUT_DIR])
+    print(f"Indexed {result['indexed']}, unchanged {result['unchanged']}, "
+          f"failed {result['failed']}, removed {result['removed']} "
+          f"({len(index.entries)} videos in index)")
+    return result['failed'] == 0
+
+
+def query_index(expression: str, min_duration: float, index_dir: str):
+    import time
+    from angle_index import AngleIndex, parse_query
+    
+    try:
+        angle, below, above = parse_query(expression)
+        index = AngleIndex(index_dir)
+        start = time.perf_counter()
+        stats = {}
+        results = index.query(angle, below, above, min_duration, stats)
+        elapsed = time.perf_counter() - start
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return False
+    
+    for result in results:
+        print(f"{result['source']}  frames {result['start_frame']}-{result['end_frame']}  "
+              f"{result['start_time']:.2f}s +{result['duration']:.2f}s  "
+              f"min {result['min']:.1f}° max {result['max']:.1f}° mean {result['mean']:.1f}°")
+    print(f"{len(results)} matches in {stats['videos']} videos "
+          f"({stats['videos_pruned']} pruned by summary), read {stats['frames_read']} "
+          f"of {stats['frames']} frames, {elapsed * 1000:.1f} ms")
+    return True
+
+
+def process_stream(source_spec: str, output: str, complexity: int = 2,
+                   confidence: float = 0.5, video_config: dict = None,
+                   inference_config: dict = None, stream_size: str = None,
+                   stream_fps: float = None, max_latency_ms: float = None,
+                   max_frames: int = None, profile: bool = False, profile_json: str = None):
+    from streaming import StreamError, open_source, parse_size
+    
+    # 输出到标准输出时，所有提示信息写到标准错误
+    log = sys.stderr if output == '-' else sys.stdout
+    print("="*60, file=log)
+    print("Pose Estimation and Visualization System (stream)", file=log)
+    print("="*60, file=log)
+    print(f"\nStream source: {source_spec}", file=log)
+    print(f"Output: {output}", file=log)
+    print(f"Model complexity: {complexity}", file=log)
+    
+    try:
+        size = parse_size(stream_size) if stream_size else None
+        source = open_source(source_spec, size, stream_fps)
+    except StreamError as e:
+        print(f"Error: {str(e)}", file=log)
+        return False
+    print(f"Resolution: {source.size[0]}x{source.size[1]}, {source.fps:.1f} FPS", file=log)
+    print(f"Max latency: {max_latency_ms:g} ms", file=log)
+    
+    print("\nInitializing system", file=log)
+    from adaptive_estimator import shared_estimator
+    from visualizer import PoseVisualizer
+    from video_processor import VideoProcessor
+    profiler = None
+    if profile or profile_json:
+        from profiler import StageProfiler
+        profiler = StageProfiler()
+    
+    estimator = shared_estimator(build_mediapipe_config(complexity, confidence, inference_config))
+    visualizer = PoseVisualizer(estimator)
+    processor = VideoProcessor(estimator, visualizer, video_config or VIDEO_CONFIG, profiler)
+    
+    print("Processing stream (Ctrl+C to stop)", file=log)
+    success = processor.process_stream(source, output, max_latency_ms / 1000.0, max_frames)
+    
+    if profiler is not None and profiler.frames > 0:
+        summary = profiler.summary()
+        print("Stage timing", file=log)
+        print("-"*60, file=log)
+        print(profiler.report(summary), file=log)
+        print("-"*60, file=log)
+        if profile_json:
+            profiler.save_json(profile_json, summary)
+            print(f"Profile saved to: {profile_json}", file=log)
+    
+    print("="*60, file=log)
+    return success
+
+
+def serve(complexity: int = 2, confidence: float = 0.5, video_config: dict = None,
+          inference_config: dict = None, workers: int = 1, host: str = None,
+          port: int = None, socket_path: str = None, max_pending: int = None):
+    import asyncio
+    from service import PoseService
+    
+    workers = workers or os.cpu_count() or 1
+    service = PoseService(build_mediapipe_config(complexity, confidence, inference_config),
+                          video_config or VIDEO_CONFIG, workers,
+                          {'max_pending': max_pending} if max_pending else None)
+    
+    print("="*60)
+    print("Pose Estimation Service")
+    print("="*60)
+    print(f"\nModel complexity: {complexity}")
+    print(f"Loading models in {workers} worker processes")
+    service.start_pool()
+    
+    address = f"unix:{socket_path}" if socket_path else f"http://{host}:{port}"
+    print(f"Listening on {address} (Ctrl+C to stop)")
+    print(f"  POST /v1/frame, POST /v1/video, GET /v1/metrics, GET /v1/health\n")
+    try:
+        asyncio.run(service.serve(host, port, socket_path))
+    finally:
+        service.shutdown()
+    print("\nService stopped")
+
+
+def batch_process(complexity: int = 2, confidence: float = 0.5,
+                  video_config: dict = None, workers: int = None,
+                  use_cache: bool = True, inference_config: dict = None):
     print("="*60)
     print("Batch Processing Mode")
     print("="*60)
@@ -103,30 +537,47 @@ def batch_process(complexity: int = 2, confidence: float = 0.5):
         print("Please add video files to the folder and retry")
         return
     
+    from batch import BatchEngine
+    
+    cache = open_cache() if use_cache and CACHE_CONFIG['enabled'] else None
+    engine = BatchEngine(build_mediapipe_config(complexity, confidence, inference_config),
+                         video_config or VIDEO_CONFIG, workers, cache)
+    engine_workers = min(engine.workers, len(video_files))
+    
     print(f"\nFound {len(video_files)} video files:")
     for i, video in enumerate(video_files, 1):
         print(f"  {i}. {os.path.basename(video)}")
     
-    print("\nStarting batch processing\n")
-    
-    success_count = 0
-    fail_count = 0
+    print(f"\nStarting batch processing ({engine_workers} workers)\n")
     
-    for i, input_path in enumerate(video_files, 1):
-        print(f"\nProcessing video {i}/{len(video_files)}: {os.path.basename(input_path)}")
-        print("-"*60)
-        
+    jobs = []
+    for input_path in video_files:
         filename = os.path.basename(input_path)
         name, ext = os.path.splitext(filename)
         output_path = os.path.join(OUTPUT_DIR, f"{name}_pose{ext}")
-        
-        if process_single_video(input_path, output_path, complexity, confidence):
-            success_count += 1
-        else:
-            fail_count += 1
+        if engine.video_config['headless']:
+            output_path = table_path_for(output_path, engine.video_config)
+        jobs.append((input_path, output_path))
+    
+    results = engine.run(jobs)
+    
+    success_count = sum(1 for r in results if r['success'])
+    fail_count = len(results) - success_count
     
     print("\n" + "="*60)
     print("Batch processing completed")
+    print("-"*60)
+    for r in results:
+        status = "OK" if r['success'] else "FAILED"
+        fps = r['frames'] / r['seconds'] if r['seconds'] > 0 else 0.0
+        cached = ", cached landmarks" if r['cached'] else ""
+        print(f"  [{status}] {os.path.basename(r['input'])}: "
+              f"{r['frames']} frames, {r['seconds']:.1f}s ({fps:.1f} FPS{cached})")
+        if r['frames_failed'] > 0:
+            print(f"      {r['frames_failed']} frames failed")
+        if r['error']:
+            print(f"      {r['error']}")
+    print("-"*60)
     print(f"  Success: {success_count} videos")
     if fail_count > 0:
         print(f"  Failed: {fail_count} videos")
@@ -137,13 +588,37 @@ def main():
     args = parse_arguments()
     
     ensure_directories()
+    video_config = build_video_config(args)
+    inference_config = build_inference_config(args)
     
     try:
-        if args.batch:
-            batch_process(args.complexity, args.confidence)
+        if args.cache_list or args.cache_clear:
+            manage_cache(args.cache_list, args.cache_clear)
+        elif args.index_build is not None or args.index_query:
+            if args.index_build is not None and not build_index(args.index_build, args.index_dir):
+                sys.exit(1)
+            if args.index_query and not query_index(args.index_query, args.min_duration,
+                                                    args.index_dir):
+                sys.exit(1)
+        elif args.serve:
+            serve(args.complexity, args.confidence, video_config, inference_config,
+                  args.workers, args.host, args.port, args.socket, args.max_pending)
+        elif args.stream:
+            if not process_stream(args.stream, args.output or 'display', args.complexity,
+                                  args.confidence, video_config, inference_config,
+                                  args.stream_size, args.stream_fps, args.max_latency,
+                                  args.max_frames, args.profile, args.profile_json):
+                sys.exit(1)
+        elif args.batch:
+            batch_process(args.complexity, args.confidence, video_config,
+                          args.workers, not args.no_cache, inference_config)
         elif args.input and args.output:
             process_single_video(args.input, args.output, 
-                               args.complexity, args.confidence)
+                               args.complexity, args.confidence, video_config,
+                               args.segments, args.render_from,
+                               args.profile, args.profile_json, inference_config,
+                               args.checkpoint, args.resume, args.chunk_frames,
+                               args.rendition)
         else:
             print("="*60)
             print("Pose Estimation and Visualization System")
@@ -165,10 +640,12 @@ def main():
                     output_path = os.path.join(OUTPUT_DIR, f"{name}_pose{ext}")
                 
                 process_single_video(input_path, output_path,
-                                   args.complexity, args.confidence)
+                                   args.complexity, args.confidence, video_config,
+                                   args.segments, inference_config=inference_config)
             
             elif choice == '2':
-                batch_process(args.complexity, args.confidence)
+                batch_process(args.complexity, args.confidence, video_config,
+                              args.workers, not args.no_cache, inference_config)
             
             elif choice == '3':
                 print("Exiting program")
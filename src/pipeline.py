@@ -0,0 +1,158 @@
+import queue
+import threading
+from collections import deque
+from typing import Callable, Iterable, List, Optional, Tuple
+import numpy as np
+
+
+class FramePacket:
+    __slots__ = ('index', 'frame', 'results', 'landmarks', 'output', 'error', 'warmup',
+                 'started', 'complexity')
+    
+    def __init__(self, index: int, frame, warmup: bool = False, started: float = 0.0):
+        self.index = index
+        self.frame = frame
+        self.warmup = warmup
+        self.started = started
+        self.results = None
+        self.landmarks = None
+        self.complexity = None
+        self.output = None
+        self.error: Optional[Exception] = None
+
+
+class FramePool:
+    """
+    整帧缓冲区池：解码（cap.read(image=...)）和绘制输出都从池中取缓冲区，帧写出后归还复用。
+    池中没有空闲缓冲区时才新分配一个，因此分配总数等于同时在途帧数的峰值；在途帧数受流水线
+    队列长度和关键帧间隔限制，处理多长的视频内存占用都保持不变。可在多个线程中同时取用和归还。
+    """
+    
+    def __init__(self, shape: Tuple[int, ...], dtype=np.uint8):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.allocated = 0
+        self._free = deque()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> np.ndarray:
+        try:
+            return self._free.pop()
+        except IndexError:
+            with self._lock:
+                self.allocated += 1
+            return np.empty(self.shape, dtype=self.dtype)
+    
+    def release(self, buffer: Optional[np.ndarray]):
+        # 解码器中途改变分辨率时得到的帧与池的形状不同，直接丢弃
+        if buffer is not None and buffer.shape == self.shape and buffer.dtype == self.dtype:
+            self._free.append(buffer)
+
+
+class SharedFrame:
+    """
+    同时交给多个消费方的帧（如多路输出）：每个消费方用完后调用 done，
+    最后一个调用时执行 release，把缓冲区归还给池。
+    """
+    
+    def __init__(self, consumers: int, release: Callable[[], None]):
+        self._count = consumers
+        self._release = release
+        self._lock = threading.Lock()
+    
+    def done(self):
+        with self._lock:
+            self._count -= 1
+            last = self._count == 0
+        if last:
+            self._release()
+
+
+class FramePipeline:
+    """
+    按顺序执行的多级流水线：每一级独占一个线程，级与级之间通过有界队列连接。
+    单线程单队列保证帧顺序不变，有界队列限制内存占用并形成反压。
+    """
+    
+    _END = object()
+    
+    def __init__(self, stages: List[Callable], queue_size: int = 8):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+    
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _get(self, q: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return self._END
+    
+    def _fail(self, exc: BaseException):
+        self._errors.append(exc)
+        self._stop.set()
+    
+    def _run_source(self, source: Iterable, out_q: queue.Queue):
+        try:
+            for item in source:
+                if not self._put(out_q, item):
+                    return
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(out_q, self._END)
+    
+    def _run_stage(self, stage: Callable, in_q: queue.Queue, out_q: queue.Queue):
+        try:
+            while True:
+                item = self._get(in_q)
+                if item is self._END:
+                    break
+                if not self._put(out_q, stage(item)):
+                    return
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(out_q, self._END)
+    
+    def run(self, source: Iterable, sink: Callable) -> None:
+        queues = [queue.Queue(maxsize=self.queue_size)
+                  for _ in range(len(self.stages) + 1)]
+        
+        threads = [threading.Thread(target=self._run_source,
+                                    args=(source, queues[0]),
+                                    name='pipeline-source', daemon=True)]
+        for i, stage in enumerate(self.stages):
+            threads.append(threading.Thread(target=self._run_stage,
+                                            args=(stage, queues[i], queues[i + 1]),
+                                            name=f'pipeline-stage-{i}', daemon=True))
+        
+        for t in threads:
+            t.start()
+        
+        try:
+            while True:
+                item = self._get(queues[-1])
+                if item is self._END:
+                    break
+                sink(item)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._stop.set()
+            for t in threads:
+                t.join()
+        
+        if self._errors:
+            raise self._errors[0]
@@ -1,27 +1,216 @@
 import cv2
-import mediapipe as mp
 import numpy as np
 from typing import Optional, Dict, List, Tuple
-from config import MEDIAPIPE_CONFIG
+from config import MEDIAPIPE_CONFIG, INFERENCE_CONFIG
+from profiler import NULL_PROFILER
+
+
+VISIBILITY_THRESHOLD = 0.5
 
 
 class PoseEstimator:
     
+    adaptive = False
+    
     def __init__(self, config: Optional[Dict] = None):
         self.config = config or MEDIAPIPE_CONFIG
+        self.inference_config = {key: self.config.get(key, default)
+                                 for key, default in INFERENCE_CONFIG.items()}
+        # MediaPipe 导入耗时较长，只在真正创建模型时才导入
+        import mediapipe as mp
         self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(**self.config)
+        self.pose = self.mp_pose.Pose(**{key: value for key, value in self.config.items()
+                                         if key not in INFERENCE_CONFIG})
+        
+        # 缩放与颜色转换共用的缓冲区，尺寸不变时每帧复用，不再分配新数组
+        self._input_buffer: Optional[np.ndarray] = None
+        # 跟踪裁剪区域 (x0, y0, x1, y1)，None 表示使用整帧
+        self.roi: Optional[Tuple[int, int, int, int]] = None
+        self._search_index = 0
+        self._window: Optional[Tuple[int, int, int, int]] = None
+        self._tracking = False
+        self._blank = np.zeros((64, 64, 3), dtype=np.uint8)
         
         self.landmark_names = [landmark.name for landmark in self.mp_pose.PoseLandmark]
         self.landmark_dict = {name: idx for idx, name in enumerate(self.landmark_names)}
+        self.profiler = NULL_PROFILER
+    
+    @property
+    def complexity(self) -> int:
+        """最近一次推理使用的模型复杂度"""
+        return self.config.get('model_complexity', MEDIAPIPE_CONFIG['model_complexity'])
+    
+    def get_inference_size(self, width: int, height: int) -> Optional[Tuple[int, int]]:
+        """返回送入模型的 (宽, 高)；不需要缩小时返回 None"""
+        scale = 1.0
+        max_side = self.inference_config['inference_max_side']
+        if max_side and max(width, height) > max_side:
+            scale = max_side / max(width, height)
+        factor = self.inference_config['inference_scale']
+        if factor and factor < scale:
+            scale = factor
+        
+        if scale >= 1.0:
+            return None
+        return max(1, round(width * scale)), max(1, round(height * scale))
+    
+    def _get_input_buffer(self, shape: Tuple[int, ...]) -> np.ndarray:
+        if self._input_buffer is None or self._input_buffer.shape != shape:
+            self._input_buffer = np.empty(shape, dtype=np.uint8)
+        return self._input_buffer
     
     def estimate(self, image: np.ndarray) -> Optional[object]:
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        """
+        关键点坐标是相对整帧归一化的，缩小后的推理结果可以直接用于原分辨率的绘制。
+        MediaPipe 会把输入拷贝进自己的数据包，因此缓冲区可以在下一帧立即复用。
+        启用跟踪裁剪时只把上一帧人体所在区域送入模型，结果再换算回整帧坐标。
+        """
+        if not self.inference_config['roi_tracking']:
+            return self._process(image)
+        
+        window = self.roi if self.roi is not None else self._next_search_window(image.shape[:2])
+        results = self._process_window(image, window)
+        if not results.pose_landmarks and self.roi is not None:
+            # 裁剪区域内跟丢，立即对整帧重新检测
+            self.roi = None
+            results = self._process_window(image, None)
+        
+        if results.pose_landmarks:
+            self._search_index = 0
+            self._update_roi(results, image.shape[:2])
+        return results
+    
+    def _process_window(self, image: np.ndarray,
+                        window: Optional[Tuple[int, int, int, int]]) -> object:
+        # MediaPipe 按上一帧输入的归一化坐标跟踪人体，输入窗口变化后这一跟踪区域就错位了，
+        # 需先丢弃跟踪状态让其重新检测
+        if window != self._window and self._tracking:
+            self._drop_tracking()
+        
+        if window is None:
+            results = self._process(image)
+        else:
+            x0, y0, x1, y1 = window
+            results = self._process(image[y0:y1, x0:x1])
+            if results.pose_landmarks:
+                self._map_to_frame(results, window, image.shape[:2])
+        
+        self._window = window
+        self._tracking = bool(results.pose_landmarks)
+        return results
+    
+    def _drop_tracking(self):
+        """
+        送入一帧很小的空白图像，使 MediaPipe 检测不到人体并在下一帧重新检测。
+        效果与 pose.reset() 相同，但 reset 会重启整个计算图，代价高一个数量级。
+        """
+        with self.profiler.measure('inference'):
+            self.pose.process(self._blank)
+        self._tracking = False
+    
+    def _next_search_window(self, image_shape: Tuple[int, int]
+                            ) -> Optional[Tuple[int, int, int, int]]:
+        """
+        未跟踪到人体时轮流尝试整帧和 3x3 个相互重叠的半幅窗口：
+        整帧缩到模型输入尺寸后，小目标往往检测不到，在半幅窗口中则能被检出
+        """
+        index = self._search_index
+        self._search_index = (index + 1) % 10
+        if index == 0:
+            return None
+        
+        h, w = image_shape
+        row, col = divmod(index - 1, 3)
+        x0, y0 = col * w // 4, row * h // 4
+        return x0, y0, x0 + w // 2, y0 + h // 2
+    
+    def _process(self, image: np.ndarray) -> object:
+        h, w = image.shape[:2]
+        size = self.get_inference_size(w, h)
+        
+        with self.profiler.measure('convert'):
+            if size is None:
+                image_rgb = self._get_input_buffer(image.shape)
+                cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image_rgb)
+            else:
+                image_rgb = self._get_input_buffer((size[1], size[0], image.shape[2]))
+                cv2.resize(image, size, dst=image_rgb, interpolation=cv2.INTER_LINEAR)
+                cv2.cvtColor(image_rgb, cv2.COLOR_BGR2RGB, dst=image_rgb)
+        
         image_rgb.flags.writeable = False
-        results = self.pose.process(image_rgb)
+        with self.profiler.measure('inference'):
+            results = self.pose.process(image_rgb)
         image_rgb.flags.writeable = True
         return results
     
+    @staticmethod
+    def _map_to_frame(results: object, roi: Tuple[int, int, int, int],
+                      image_shape: Tuple[int, int]):
+        """把相对裁剪区域归一化的关键点原地换算为相对整帧归一化"""
+        h, w = image_shape
+        x0, y0, x1, y1 = roi
+        sx, sy = (x1 - x0) / w, (y1 - y0) / h
+        ox, oy = x0 / w, y0 / h
+        for landmark in results.pose_landmarks.landmark:
+            landmark.x = landmark.x * sx + ox
+            landmark.y = landmark.y * sy + oy
+            # z 与 x 使用相同的尺度
+            landmark.z = landmark.z * sx
+    
+    def _update_roi(self, results: object, image_shape: Tuple[int, int]):
+        """
+        根据本帧关键点包围盒决定下一帧的裁剪区域。每次改变裁剪区域都要让 MediaPipe 重新检测，
+        因此只有人体接近区域边缘时才重新裁剪（人体变小不触发，只在跟丢后重新捕获时收紧），
+        新区域四周留出 roi_margin 的余量。
+        """
+        h, w = image_shape
+        # 包围盒使用全部关键点（含不可见点的预测位置），只按可见点裁剪会把被遮挡的肢体切掉
+        points = np.clip(self.get_landmark_array(results)[:, :2], 0.0, 1.0) * (w, h)
+        
+        bx0, by0 = points.min(axis=0)
+        bx1, by1 = points.max(axis=0)
+        extent = max(bx1 - bx0, by1 - by0, 1.0)
+        margin = self.inference_config['roi_margin'] * extent
+        
+        min_side = self.inference_config['roi_min_size'] * max(w, h)
+        target_w = max(bx1 - bx0 + 2 * margin, min_side)
+        target_h = max(by1 - by0 + 2 * margin, min_side)
+        
+        roi = self.roi
+        if roi is not None:
+            x0, y0, x1, y1 = roi
+            inner = margin / 4
+            # 贴着画面边缘的一侧不要求留余量
+            inside = ((bx0 - inner >= x0 or x0 == 0) and (by0 - inner >= y0 or y0 == 0) and
+                      (bx1 + inner <= x1 or x1 == w) and (by1 + inner <= y1 or y1 == h))
+            if inside:
+                return
+        
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+        x0, x1 = int(max(0, cx - target_w / 2)), int(min(w, cx + target_w / 2))
+        y0, y1 = int(max(0, cy - target_h / 2)), int(min(h, cy + target_h / 2))
+        
+        # 裁剪区域接近整帧时没有收益，直接使用整帧；从整帧切换到裁剪的门槛更低，避免来回切换
+        limit = 0.5 if roi is not None else 0.25
+        if (x1 - x0) * (y1 - y0) < limit * w * h:
+            self.roi = (x0, y0, x1, y1)
+        else:
+            self.roi = None
+    
+    def reset_tracking(self):
+        """丢弃跟踪状态与裁剪区域，下一帧重新检测，不重启计算图"""
+        self.roi = None
+        self._search_index = 0
+        self._window = None
+        self._drop_tracking()
+    
+    def reset(self):
+        self.roi = None
+        self._search_index = 0
+        self._window = None
+        self._tracking = False
+        self.pose.reset()
+    
     def get_landmark_coords(self, results: object, landmark_name: str, 
                            image_shape: Tuple[int, int]) -> Optional[Tuple[int, int]]:
         if not results.pose_landmarks:
@@ -35,27 +224,42 @@ class PoseEstimator:
             x = int(landmark.x * w)
             y = int(landmark.y * h)
             
-            if landmark.visibility < 0.5:
+            if landmark.visibility < VISIBILITY_THRESHOLD:
                 return None
-                
+            
             return (x, y)
         except (KeyError, IndexError):
             return None
     
     def get_all_landmarks(self, results: object, 
                          image_shape: Tuple[int, int]) -> Dict[str, Tuple[int, int]]:
-        landmarks_dict = {}
+        landmarks = self.get_landmark_array(results)
+        if landmarks is None:
+            return {}
         
+        points = self.to_pixel_coords(landmarks, image_shape)
+        visible = self.get_visibility_mask(landmarks)
+        return {self.landmark_names[idx]: (int(points[idx, 0]), int(points[idx, 1]))
+                for idx in np.flatnonzero(visible)}
+    
+    def get_landmark_array(self, results: object) -> Optional[np.ndarray]:
+        """一次遍历把 pose_landmarks 转成 (33, 4) float32 数组，列为 x, y, z, visibility"""
         if not results.pose_landmarks:
-            return landmarks_dict
+            return None
         
+        return np.array([(lm.x, lm.y, lm.z, lm.visibility)
+                         for lm in results.pose_landmarks.landmark], dtype=np.float32)
+    
+    @staticmethod
+    def get_visibility_mask(landmarks: np.ndarray) -> np.ndarray:
+        return landmarks[..., 3] >= VISIBILITY_THRESHOLD
+    
+    @staticmethod
+    def to_pixel_coords(landmarks: np.ndarray,
+                        image_shape: Tuple[int, int]) -> np.ndarray:
         h, w = image_shape
-        for name in self.landmark_names:
-            coords = self.get_landmark_coords(results, name, image_shape)
-            if coords:
-                landmarks_dict[name] = coords
-        
-        return landmarks_dict
+        scale = np.array([w, h], dtype=np.float64)
+        return (landmarks[..., :2].astype(np.float64) * scale).astype(np.int32)
     
     def calculate_angle(self, point1: Tuple[int, int], 
                        point2: Tuple[int, int], 
@@ -79,6 +283,12 @@ class PoseEstimator:
         p2 = np.array(point2)
         return np.linalg.norm(p1 - p2)
     
+    def close(self):
+        pose = getattr(self, 'pose', None)
+        if pose is not None:
+            pose.close()
+            self.pose = None
+    
     def __del__(self):
-        self.pose.close()
+        self.close()
 
@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import numpy as np
+
+
+# 报告中各阶段的显示顺序，未列出的阶段按首次出现顺序排在后面
+STAGE_ORDER = [
+    'decode',
+    'convert',
+    'inference',
+    'landmarks',
+    'interpolate',
+    'copy',
+    'draw_skeleton',
+    'draw_angles',
+    'draw_info_panel',
+    'encode'
+]
+
+
+class NullProfiler:
+    """未启用性能分析时使用，所有调用均为空操作"""
+
+    enabled = False
+
+    @contextmanager
+    def measure(self, stage: str):
+        yield
+
+    def record(self, stage: str, seconds: float):
+        pass
+
+    def record_latency(self, seconds: float):
+        pass
+
+    def add_run(self, frames: int, seconds: float):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class StageProfiler:
+    """
+    按阶段收集每次调用的耗时（秒）。流水线模式下各阶段在不同线程中记录，
+    因此追加样本时加锁；各阶段可能并行执行，占比按各阶段耗时之和计算。
+    帧延迟（从开始解码到写出完成）单独记录，不计入阶段占比。
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self._samples: Dict[str, array] = {}
+        self._latency = array('d')
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.wall_seconds = 0.0
+
+    @contextmanager
+    def measure(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = array('d')
+            samples.append(seconds)
+
+    def record_latency(self, seconds: float):
+        with self._lock:
+            self._latency.append(seconds)
+
+    def add_run(self, frames: int, seconds: float):
+        with self._lock:
+            self.frames += frames
+            self.wall_seconds += seconds
+
+    def _ordered_stages(self) -> List[str]:
+        known = [stage for stage in STAGE_ORDER if stage in self._samples]
+        return known + [stage for stage in self._samples if stage not in STAGE_ORDER]
+
+    def summary(self) -> Dict:
+        with self._lock:
+            samples = {stage: np.frombuffer(self._samples[stage], dtype=np.float64).copy()
+                       for stage in self._ordered_stages()}
+            latency = np.frombuffer(self._latency, dtype=np.float64).copy()
+
+        stage_total = sum(float(values.sum()) for values in samples.values())
+        stages = {}
+        for stage, values in samples.items():
+            stages[stage] = self._describe(values)
+            stages[stage]['share'] = (stages[stage]['total_s'] / stage_total
+                                      if stage_total > 0 else 0.0)
+
+        return {
+            'frames': self.frames,
+            'wall_s': self.wall_seconds,
+            'throughput_fps': self.frames / self.wall_seconds if self.wall_seconds > 0 else 0.0,
+            'latency': self._describe(latency) if latency.size else None,
+            'stages': stages
+        }
+
+    @staticmethod
+    def _describe(values: np.ndarray) -> Dict:
+        p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000.0
+        return {
+            'count': int(values.size),
+            'total_s': float(values.sum()),
+            'mean_ms': float(values.mean()) * 1000.0,
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'p99_ms': float(p99)
+        }
+
+    def report(self, summary: Optional[Dict] = None) -> str:
+        summary = summary or self.summary()
+        lines = [
+            f"{'Stage':<16}{'Count':>8}{'Mean ms':>10}{'p50 ms':>10}"
+            f"{'p95 ms':>10}{'p99 ms':>10}{'Share':>8}"
+        ]
+        for stage, s in summary['stages'].items():
+            lines.append(f"{stage:<16}{s['count']:>8}{s['mean_ms']:>10.3f}{s['p50_ms']:>10.3f}"
+                         f"{s['p95_ms']:>10.3f}{s['p99_ms']:>10.3f}{s['share']:>8.1%}")
+        latency = summary['latency']
+        if latency is not None:
+            lines.append(f"{'frame latency':<16}{latency['count']:>8}{latency['mean_ms']:>10.3f}"
+                         f"{latency['p50_ms']:>10.3f}{latency['p95_ms']:>10.3f}"
+                         f"{latency['p99_ms']:>10.3f}")
+        lines.append(f"Frames: {summary['frames']}, wall time: {summary['wall_s']:.2f}s, "
+                     f"throughput: {summary['throughput_fps']:.1f} FPS")
+        return "\n".join(lines)
+
+    def save_json(self, path: str, summary: Optional[Dict] = None):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(summary or self.summary(), f, indent=2)
@@ -0,0 +1,175 @@
+import os
+import queue
+import threading
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+from pipeline import SharedFrame
+from writers import EncoderError, IMAGE_EXTENSIONS, ThumbnailStripWriter, open_writer
+from config import RENDITION_CONFIG
+
+
+_OPTIONS = ('width', 'height', 'scale', 'every', 'codec', 'overlay')
+
+
+def parse_rendition(spec: str) -> Dict:
+    """
+    解析一路输出：'PATH[,key=value...]'，如 'output/preview.mp4,width=640,every=2,overlay=0'。
+    width/height 只给一个时按原比例计算另一个；scale 为缩放比例；every 为每 N 帧取一帧；
+    codec 为 OpenCV FourCC（不给时与主输出使用相同的编码后端）；overlay 为 0 时输出原始画面。
+    扩展名为图片时输出缩略图条。
+    """
+    path, *options = spec.split(',')
+    rendition = {'output': path.strip(), 'width': None, 'height': None, 'scale': None,
+                 'every': 1, 'codec': None, 'overlay': True}
+    if not rendition['output']:
+        raise ValueError(f"Rendition has no output path: {spec!r}")
+
+    for option in options:
+        key, sep, value = option.partition('=')
+        key, value = key.strip().lower(), value.strip()
+        if not sep or key not in _OPTIONS:
+            raise ValueError(f"Invalid rendition option '{option}' in {spec!r} "
+                             f"(expected {', '.join(_OPTIONS)})")
+        try:
+            if key in ('width', 'height', 'every'):
+                rendition[key] = int(value)
+                if rendition[key] < 1:
+                    raise ValueError
+            elif key == 'scale':
+                rendition[key] = float(value)
+                if rendition[key] <= 0:
+                    raise ValueError
+            elif key == 'overlay':
+                if value.lower() not in ('0', '1', 'on', 'off', 'true', 'false'):
+                    raise ValueError
+                rendition[key] = value.lower() in ('1', 'on', 'true')
+            else:
+                if len(value) != 4:
+                    raise ValueError
+                rendition[key] = value
+        except ValueError:
+            raise ValueError(f"Invalid value for '{key}' in rendition {spec!r}")
+    return rendition
+
+
+def rendition_size(rendition: Dict, source_size: Tuple[int, int]) -> Tuple[int, int]:
+    """输出尺寸：显式给出的宽高原样使用，按比例算出的边取偶数（多数编码器要求）"""
+    width, height = source_size
+    if rendition['width'] and rendition['height']:
+        return rendition['width'], rendition['height']
+    if rendition['width']:
+        scale = rendition['width'] / width
+    elif rendition['height']:
+        scale = rendition['height'] / height
+    elif rendition['scale']:
+        scale = rendition['scale']
+    else:
+        return width, height
+
+    def even(value):
+        return max(2, int(round(value / 2)) * 2)
+
+    return (rendition['width'] or even(width * scale),
+            rendition['height'] or even(height * scale))
+
+
+class Rendition:
+    """一路附加输出：独立线程中把共享的帧缩放到目标尺寸并编码，与主输出和其他各路并行"""
+
+    def __init__(self, spec: Dict, source_size: Tuple[int, int], fps: float,
+                 video_config: Dict, config: Dict):
+        self.output = spec['output']
+        self.overlay = spec['overlay']
+        self.every = spec['every']
+        self.size = rendition_size(spec, source_size)
+        self.fps = fps / self.every
+        self.frames = 0
+        self.error: Optional[str] = None
+
+        self._buffer = None
+        if self.size != tuple(source_size):
+            self._buffer = np.empty((self.size[1], self.size[0], 3), dtype=np.uint8)
+
+        if os.path.splitext(self.output)[1].lower() in IMAGE_EXTENSIONS:
+            self._writer = ThumbnailStripWriter(self.output, self.size, config['strip_columns'])
+        else:
+            self._writer = open_writer(self.output, self.fps, self.size, video_config,
+                                       spec['codec'])
+        if not self._writer.isOpened():
+            self._writer.release()
+            raise EncoderError(f"Cannot create output file: {self.output}")
+
+        self._queue = queue.Queue(config['queue_size'])
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def wants(self, index: int) -> bool:
+        return (index - 1) % self.every == 0
+
+    def put(self, shared: SharedFrame, image: np.ndarray):
+        self._queue.put((shared, image))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            shared, image = item
+            try:
+                # 编码失败后不再写入，但仍要归还之后收到的帧
+                if self.error is None:
+                    if self._buffer is not None:
+                        image = cv2.resize(image, self.size, dst=self._buffer,
+                                           interpolation=cv2.INTER_AREA)
+                    self._writer.write(image)
+                    self.frames += 1
+            except Exception as e:
+                self.error = str(e)
+            finally:
+                shared.done()
+
+    def close(self) -> Dict:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            self._writer.release()
+            if self.error is None and self._writer.error is not None:
+                self.error = self._writer.error
+        return {'output': self.output, 'size': self.size, 'frames': self.frames,
+                'error': self.error}
+
+
+class RenditionSet:
+    """
+    一次解码、一次推理、一次绘制，同时输出多路成品（全分辨率视频之外的预览小样、缩略图条等）：
+    主输出写出每一帧前把解码帧与绘制好的输出帧交给各路，overlay 的路取绘制后的画面，
+    其余取原始画面，各自缩放、抽帧后在自己的线程中编码。
+    帧缓冲区在主输出和所有取用该帧的路都用完后才归还给池。
+    """
+
+    def __init__(self, specs: List[Dict], source_size: Tuple[int, int], fps: float,
+                 video_config: Dict, config: Optional[Dict] = None):
+        self.config = dict(RENDITION_CONFIG, **(config or {}))
+        self.renditions = []
+        try:
+            for spec in specs:
+                self.renditions.append(Rendition(spec, source_size, fps, video_config,
+                                                 self.config))
+        except Exception:
+            self.close()
+            raise
+
+    def submit(self, index: int, frame: np.ndarray, output: Optional[np.ndarray],
+               error: Optional[Exception], release) -> SharedFrame:
+        """把一帧交给需要它的各路，返回的 SharedFrame 还为调用方保留一份引用，用完后调用 done"""
+        consumers = [rendition for rendition in self.renditions if rendition.wants(index)]
+        shared = SharedFrame(len(consumers) + 1, release)
+        for rendition in consumers:
+            annotated = rendition.overlay and error is None and output is not None
+            rendition.put(shared, output if annotated else frame)
+        return shared
+
+    def close(self) -> List[Dict]:
+        return [rendition.close() for rendition in self.renditions]
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional
+from landmark_store import SIDECAR_EXTENSION
+from config import INFERENCE_CONFIG
+
+
+# 只有这些参数会影响关键点结果，其余配置变化不应导致缓存失效
+CACHE_KEY_FIELDS = (
+    'static_image_mode',
+    'model_complexity',
+    'smooth_landmarks',
+    'min_detection_confidence',
+    'min_tracking_confidence'
+) + tuple(INFERENCE_CONFIG)
+
+_KEY_VERSION = 1
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    按内容寻址的关键点结果缓存：键为输入文件的 SHA-256 加上影响推理结果的
+    MediaPipe 参数，值为 .pose 关键点文件。文件的修改时间记录最近使用时间，
+    总大小超过上限时按最久未使用的顺序淘汰。
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key_for(self, input_path: str, mediapipe_config: Dict) -> str:
+        params = {field: mediapipe_config.get(field) for field in CACHE_KEY_FIELDS}
+        payload = json.dumps({'version': _KEY_VERSION, 'input': hash_file(input_path),
+                              'params': params}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + SIDECAR_EXTENSION)
+
+    def staging_path(self, key: str) -> str:
+        fd, path = tempfile.mkstemp(prefix=key + '.', suffix='.tmp', dir=self.cache_dir)
+        os.close(fd)
+        return path
+
+    def lookup(self, key: str) -> Optional[str]:
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)
+        return path
+
+    def store(self, key: str, landmarks_path: str, move: bool = False) -> str:
+        path = self._entry_path(key)
+        if move:
+            os.replace(landmarks_path, path)
+        else:
+            staging = self.staging_path(key)
+            shutil.copyfile(landmarks_path, staging)
+            os.replace(staging, path)
+        self.evict(keep=key)
+        return path
+
+    def entries(self) -> List[Dict]:
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(SIDECAR_EXTENSION):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            entries.append({
+                'key': name[:-len(SIDECAR_EXTENSION)],
+                'size': stat.st_size,
+                'last_used': stat.st_mtime
+            })
+        entries.sort(key=lambda entry: entry['last_used'], reverse=True)
+        return entries
+
+    def total_size(self) -> int:
+        return sum(entry['size'] for entry in self.entries())
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        entries = self.entries()
+        total = sum(entry['size'] for entry in entries)
+        removed = 0
+        for entry in reversed(entries):
+            if total <= self.max_bytes:
+                break
+            if entry['key'] == keep:
+                continue
+            os.remove(self._entry_path(entry['key']))
+            total -= entry['size']
+            removed += 1
+        return removed
+
+    def clear(self) -> int:
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(SIDECAR_EXTENSION):
+                removed += 1
+            elif not name.endswith('.tmp'):
+                continue
+            os.remove(os.path.join(self.cache_dir, name))
+        return removed
+
+    @staticmethod
+    def format_time(timestamp: float) -> str:
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
@@ -0,0 +1,173 @@
+import atexit
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import cv2
+from batch import build_processor
+from video_processor import VideoProcessor, VideoProcessingError
+from landmark_store import LandmarkStore, sidecar_path_for
+from adaptive_estimator import ComplexityLog, complexity_log_path_for
+from writers import EncoderError, open_writer
+from config import SEGMENT_CONFIG
+
+
+_segment_processor: Optional[VideoProcessor] = None
+
+
+def _init_segment_worker(mediapipe_config: Dict, video_config: Dict):
+    global _segment_processor
+    _segment_processor = build_processor(mediapipe_config, video_config)
+    atexit.register(_segment_processor.estimator.close)
+
+
+def _run_segment(input_path: str, output_path: str, start: int, end: int,
+                 warmup: int, codec: str) -> Dict:
+    _segment_processor.estimator.reset()
+    stats = _segment_processor.run_video(input_path, output_path,
+                                         frame_range=(start, end),
+                                         warmup=warmup, codec=codec)
+    stats['output'] = output_path
+    stats['frames'] = end - start
+    return stats
+
+
+def plan_segments(total_frames: int, segments: int,
+                  min_frames: int = 0) -> List[Tuple[int, int]]:
+    if total_frames <= 0:
+        return []
+    
+    if min_frames > 0:
+        segments = min(segments, max(1, total_frames // min_frames))
+    segments = max(1, min(segments, total_frames))
+    
+    bounds = [round(i * total_frames / segments) for i in range(segments + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(segments)]
+
+
+def join_segments(segment_paths: List[str], output_path: str, fps: float,
+                  size: Tuple[int, int], video_config: Dict) -> int:
+    out = open_writer(output_path, fps, size, video_config)
+    if not out.isOpened():
+        raise VideoProcessingError(f"Cannot create output video file: {output_path}")
+    
+    written = 0
+    try:
+        for path in segment_paths:
+            cap = cv2.VideoCapture(path)
+            if not cap.isOpened():
+                raise VideoProcessingError(f"Cannot open segment file: {path}")
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                out.write(frame)
+                written += 1
+            cap.release()
+    except EncoderError as e:
+        raise VideoProcessingError(str(e))
+    finally:
+        out.release()
+    
+    if out.error is not None:
+        raise VideoProcessingError(f"Encoder failed: {out.error}")
+    return written
+
+
+class SegmentProcessor:
+    """
+    单个长视频的分段并行处理：按 CAP_PROP_POS_FRAMES 定位把视频切成若干时间段，
+    每段在独立进程中处理，最后按原始顺序拼接成一个输出文件。
+    smooth_landmarks 的跟踪状态无法跨段延续，因此每段从起点前 warmup 帧开始推理，
+    预热帧只用于让跟踪收敛，不写入输出。
+    """
+    
+    def __init__(self, mediapipe_config: Dict, video_config: Dict,
+                 workers: Optional[int] = None, config: Optional[Dict] = None):
+        self.mediapipe_config = mediapipe_config
+        self.video_config = video_config
+        self.config = config or SEGMENT_CONFIG
+        self.workers = max(1, workers or os.cpu_count() or 1)
+    
+    def process_video(self, input_path: str, output_path: str,
+                      segments: Optional[int] = None) -> bool:
+        info = VideoProcessor.get_video_info(input_path)
+        if info is None:
+            print(f"Error: Cannot open video file: {input_path}")
+            return False
+        
+        total_frames = info['frame_count']
+        plan = plan_segments(total_frames, segments or self.workers,
+                             self.config['min_segment_frames'])
+        if not plan:
+            print(f"Error: Video has no frames: {input_path}")
+            return False
+        
+        workers = min(self.workers, len(plan))
+        warmup = self.config['warmup_frames']
+        codec = self.config['intermediate_codec']
+        
+        print(f"\nVideo information:")
+        print(f"  Resolution: {info['width']}x{info['height']}")
+        print(f"  Frame rate: {info['fps']:.2f} FPS")
+        print(f"  Total frames: {total_frames}")
+        print(f"  Segments: {len(plan)} ({workers} workers, {warmup} warm-up frames)\n")
+        
+        output_dir = os.path.dirname(os.path.abspath(output_path))
+        work_dir = tempfile.mkdtemp(prefix='.segments_', dir=output_dir)
+        segment_paths = [os.path.join(work_dir, f"segment_{i:04d}.avi")
+                         for i in range(len(plan))]
+        
+        try:
+            context = multiprocessing.get_context('spawn')
+            video_config = dict(self.video_config, show_progress=False)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_segment_worker,
+                                     initargs=(self.mediapipe_config,
+                                               video_config)) as pool:
+                futures = [pool.submit(_run_segment, input_path, path,
+                                       start, end, warmup, codec)
+                           for path, (start, end) in zip(segment_paths, plan)]
+                results = [future.result() for future in futures]
+            
+            success = sum(r['success'] for r in results)
+            fail = sum(r['fail'] for r in results)
+            
+            output_fps = self.video_config['output_fps'] or info['fps']
+            written = join_segments(segment_paths, output_path, output_fps,
+                                    (info['width'], info['height']),
+                                    self.video_config)
+            
+            landmarks_path = None
+            if self.video_config.get('save_landmarks', False):
+                landmarks_path = sidecar_path_for(output_path)
+                LandmarkStore.concatenate([r['landmarks_path'] for r in results],
+                                          landmarks_path)
+            
+            complexity_log = None
+            if results and results[0].get('complexity_log'):
+                complexity_log = complexity_log_path_for(output_path)
+                ComplexityLog.concatenate([r['complexity_log'] for r in results],
+                                          complexity_log)
+        except VideoProcessingError as e:
+            print(f"Error: {str(e)}")
+            return False
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+        print(f"\nProcessing completed")
+        print(f"  Successfully processed: {success} frames")
+        if fail > 0:
+            print(f"  Failed: {fail} frames")
+        if written != total_frames:
+            print(f"  Warning: output has {written} frames, input reports {total_frames}")
+        print(f"  Output file: {output_path}")
+        if landmarks_path:
+            print(f"  Landmarks file: {landmarks_path}")
+        if complexity_log:
+            print(f"  Complexity log: {complexity_log}")
+        print()
+        
+        return True
@@ -0,0 +1,357 @@
+import asyncio
+import atexit
+import json
+import multiprocessing
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+from config import SERVICE_CONFIG, LANDMARK_NAMES
+
+
+_worker_state: Optional[Dict] = None
+
+
+def _init_service_worker(mediapipe_config: Dict, video_config: Dict):
+    """
+    每个工作进程启动时创建一次模型并常驻：单帧请求之间没有时间关联，
+    使用 static_image_mode 的估计器；视频任务使用与批处理相同的处理器
+    """
+    global _worker_state
+    # Ctrl+C 由主进程处理，工作进程随进程池关闭而退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from adaptive_estimator import create_estimator
+    from visualizer import PoseVisualizer
+    from angles import AngleEngine
+    from batch import build_processor, _close_processor
+
+    frame_estimator = create_estimator(dict(mediapipe_config, static_image_mode=True))
+    # 计算图第一次运行时才分配内部缓冲区，先空跑一帧
+    frame_estimator.estimate(np.zeros((256, 256, 3), dtype=np.uint8))
+    processor = build_processor(mediapipe_config, video_config)
+    _worker_state = {
+        'estimator': frame_estimator,
+        'visualizer': PoseVisualizer(frame_estimator),
+        'angles': AngleEngine({name: idx for idx, name in enumerate(LANDMARK_NAMES)}),
+        'processor': processor
+    }
+    # 解释器退出阶段再由 __del__ 关闭 MediaPipe 图会卡死，需在退出前显式关闭
+    atexit.register(frame_estimator.close)
+    atexit.register(_close_processor, processor)
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+def _estimate_frame(data: bytes, annotate: bool, quality: int) -> Dict:
+    import cv2
+    from pose_estimator import PoseEstimator
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Cannot decode image")
+
+    state = _worker_state
+    started = time.perf_counter()
+    results = state['estimator'].estimate(image)
+    inference_ms = (time.perf_counter() - started) * 1000.0
+    landmarks = state['estimator'].get_landmark_array(results)
+
+    h, w = image.shape[:2]
+    response = {'width': w, 'height': h, 'detected': landmarks is not None,
+                'inference_ms': inference_ms, 'landmarks': None, 'angles': None}
+    if landmarks is not None:
+        points = PoseEstimator.to_pixel_coords(landmarks, (h, w))
+        visible = PoseEstimator.get_visibility_mask(landmarks)
+        angles = state['angles'].compute(points, visible)
+        response['landmarks'] = {name: [float(v) for v in landmarks[idx]]
+                                 for idx, name in enumerate(LANDMARK_NAMES)}
+        response['angles'] = {name: None if np.isnan(value) else float(value)
+                              for name, value in zip(state['angles'].names, angles)}
+
+    if annotate:
+        output = state['visualizer'].visualize_landmarks(image, landmarks)
+        ok, encoded = cv2.imencode('.jpg', output, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError("Cannot encode annotated image")
+        response['image'] = encoded.tobytes()
+    return response
+
+
+def _process_video_job(input_path: str, output_path: str, headless: bool) -> Dict:
+    processor = _worker_state['processor']
+    if processor.estimator is not None:
+        processor.estimator.reset()
+    if headless:
+        stats = processor.run_headless(input_path, output_path)
+    else:
+        stats = processor.run_video(input_path, output_path)
+    return stats
+
+
+class _Metrics:
+    """按接口统计请求数、错误数、被拒绝数与最近若干次请求的延迟分位数"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self.started = time.time()
+        self.endpoints: Dict[str, Dict] = {}
+
+    def _entry(self, endpoint: str) -> Dict:
+        entry = self.endpoints.get(endpoint)
+        if entry is None:
+            entry = self.endpoints[endpoint] = {
+                'requests': 0, 'errors': 0, 'rejected': 0,
+                'latency': deque(maxlen=self.window)
+            }
+        return entry
+
+    def record(self, endpoint: str, seconds: float, error: bool = False):
+        entry = self._entry(endpoint)
+        entry['requests'] += 1
+        entry['errors'] += int(error)
+        entry['latency'].append(seconds)
+
+    def reject(self, endpoint: str):
+        self._entry(endpoint)['rejected'] += 1
+
+    def snapshot(self) -> Dict:
+        endpoints = {}
+        for endpoint, entry in self.endpoints.items():
+            summary = {key: entry[key] for key in ('requests', 'errors', 'rejected')}
+            if entry['latency']:
+                values = np.array(entry['latency']) * 1000.0
+                p50, p95, p99 = np.percentile(values, [50, 95, 99])
+                summary['latency_ms'] = {'mean': float(values.mean()), 'p50': float(p50),
+                                         'p95': float(p95), 'p99': float(p99)}
+            endpoints[endpoint] = summary
+        return {'uptime_s': time.time() - self.started, 'endpoints': endpoints}
+
+
+class HttpError(Exception):
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 422: 'Unprocessable Entity',
+            500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class PoseService:
+    """
+    常驻的姿态估计服务：asyncio 处理 HTTP/1.1 连接（TCP 或 Unix 套接字，支持 keep-alive），
+    推理在常驻模型的工作进程池中执行。已接受但未完成的请求数达到 max_pending 时
+    立即返回 503，而不是无限排队。
+
+    接口：
+      POST /v1/frame           请求体为 JPEG/PNG 图像，返回关键点与关节角度 (JSON)；
+                               ?output=image 时返回绘制了骨架的 JPEG
+      POST /v1/video           请求体为 JSON {"input", "output", "headless"}，处理服务器本地的视频文件
+      GET  /v1/metrics         队列深度、各接口请求数与延迟分位数
+      GET  /v1/health
+    """
+
+    def __init__(self, mediapipe_config: Dict, video_config: Dict,
+                 workers: int = 1, config: Optional[Dict] = None):
+        self.mediapipe_config = mediapipe_config
+        self.video_config = dict(video_config, show_progress=False)
+        self.workers = max(1, workers)
+        self.config = dict(SERVICE_CONFIG, **(config or {}))
+        self.metrics = _Metrics()
+        self.pending = 0
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    def start_pool(self):
+        context = multiprocessing.get_context('spawn')
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                        initializer=_init_service_worker,
+                                        initargs=(self.mediapipe_config, self.video_config))
+        # 启动时就让每个进程完成模型加载，第一个请求不必等待
+        pids = {future.result() for future in
+                [self.pool.submit(_warm_up) for _ in range(self.workers * 2)]}
+        return len(pids)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    async def serve(self, host: Optional[str] = None, port: Optional[int] = None,
+                    socket_path: Optional[str] = None):
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            server = await asyncio.start_unix_server(self._handle_connection, socket_path)
+        else:
+            server = await asyncio.start_server(self._handle_connection,
+                                                host or self.config['host'],
+                                                port or self.config['port'])
+        
+        # 收到 SIGINT/SIGTERM 时停止接受连接并返回，由调用方关闭进程池
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        async with server:
+            await stop.wait()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, content_type, payload = await self._dispatch(method, target, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, content_type, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HttpError as e:
+            self._write_json(writer, e.status, {'error': str(e)}, keep_alive=False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader
+                            ) -> Optional[Tuple[str, str, Dict, bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', 0) or 0)
+        if length > self.config['max_body_mb'] * 1024 * 1024:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, str, bytes]:
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        path = url.path.rstrip('/')
+
+        routes = {
+            '/v1/frame': ('POST', self._frame),
+            '/v1/video': ('POST', self._video),
+            '/v1/metrics': ('GET', self._metrics),
+            '/v1/health': ('GET', self._health)
+        }
+        if path not in routes:
+            return self._json(404, {'error': f"Unknown endpoint: {path}"})
+        expected, handler = routes[path]
+        if method != expected:
+            return self._json(405, {'error': f"Use {expected} for {path}"})
+        return await handler(body, query)
+
+    async def _submit(self, endpoint: str, fn, *args):
+        """把任务交给工作进程；在途请求已满时抛出 503，交给调用方稍后重试"""
+        if self.pending >= self.config['max_pending']:
+            self.metrics.reject(endpoint)
+            raise HttpError(503, "Server busy, retry later")
+
+        self.pending += 1
+        started = time.perf_counter()
+        error = False
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, fn, *args)
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.pending -= 1
+            self.metrics.record(endpoint, time.perf_counter() - started, error)
+
+    async def _frame(self, body: bytes, query: Dict) -> Tuple[int, str, bytes]:
+        if not body:
+            return self._json(400, {'error': "Request body must be an encoded image"})
+        annotate = query.get('output', ['json'])[0] == 'image'
+        try:
+            result = await self._submit('frame', _estimate_frame, body, annotate,
+                                        self.config['jpeg_quality'])
+        except HttpError as e:
+            return self._json(e.status, {'error': str(e)})
+        except ValueError as e:
+            return self._json(422, {'error': str(e)})
+
+        if annotate:
+            return 200, 'image/jpeg', result['image']
+        return self._json(200, result)
+
+    async def _video(self, body: bytes, query: Dict) -> Tuple[int, str, bytes]:
+        from video_processor import VideoProcessingError
+
+        try:
+            job = json.loads(body or b'{}')
+            input_path, output_path = job['input'], job['output']
+        except (ValueError, KeyError, TypeError):
+            return self._json(400, {'error': 'Expected JSON {"input": ..., "output": ...}'})
+
+        try:
+            stats = await self._submit('video', _process_video_job, input_path, output_path,
+                                       bool(job.get('headless', False)))
+        except HttpError as e:
+            return self._json(e.status, {'error': str(e)})
+        except VideoProcessingError as e:
+            return self._json(422, {'error': str(e)})
+        return self._json(200, stats)
+
+    async def _metrics(self, body: bytes, query: Dict) -> Tuple[int, str, bytes]:
+        snapshot = self.metrics.snapshot()
+        snapshot.update({
+            'workers': self.workers,
+            'in_flight': self.pending,
+            'queue_depth': max(0, self.pending - self.workers),
+            'max_pending': self.config['max_pending']
+        })
+        return self._json(200, snapshot)
+
+    async def _health(self, body: bytes, query: Dict) -> Tuple[int, str, bytes]:
+        return self._json(200, {'status': 'ok', 'workers': self.workers})
+
+    @staticmethod
+    def _json(status: int, payload: Dict) -> Tuple[int, str, bytes]:
+        return status, 'application/json', json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+    def _write_json(self, writer: asyncio.StreamWriter, status: int, payload: Dict,
+                    keep_alive: bool = True):
+        self._write_response(writer, *self._json(status, payload), keep_alive)
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, content_type: str,
+                        payload: bytes, keep_alive: bool = True):
+        headers = [
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(payload)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"
+        ]
+        if status == 503:
+            headers.append("Retry-After: 1")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode('latin-1') + payload)
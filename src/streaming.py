@@ -0,0 +1,240 @@
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, Tuple
+import cv2
+import numpy as np
+from writers import EncoderError
+from config import STREAM_CONFIG
+
+
+class StreamError(Exception):
+    pass
+
+
+class FrameBuffer:
+    """
+    有界采集队列：满时丢弃最旧的帧，而不是让采集端阻塞，
+    保证推理跟不上时处理的总是最新画面而不是越积越多的旧帧。
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = max(1, maxsize)
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item):
+        with self._cond:
+            if self._closed:
+                return
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get(self, max_age: Optional[float] = None):
+        """
+        取出最旧的一帧；给出 max_age 时先丢弃采集时间早于 max_age 秒之前的帧，
+        但总会保留最新的一帧。队列已关闭且为空时返回 None。
+        """
+        with self._cond:
+            while not self._items and not self._closed:
+                self._cond.wait(0.1)
+            if not self._items:
+                return None
+
+            if max_age is not None:
+                now = time.perf_counter()
+                while len(self._items) > 1 and now - self._items[0].started > max_age:
+                    self._items.popleft()
+                    self.dropped += 1
+            return self._items.popleft()
+
+
+class CaptureSource:
+    """摄像头编号、RTSP/HTTP 地址或视频文件，由 cv2.VideoCapture 读取"""
+
+    def __init__(self, spec: str, fps: Optional[float] = None):
+        target = int(spec) if spec.isdigit() else spec
+        self.cap = cv2.VideoCapture(target)
+        if not self.cap.isOpened():
+            raise StreamError(f"Cannot open stream: {spec}")
+
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or fps or STREAM_CONFIG['fps']
+        self._first = None
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if width <= 0 or height <= 0:
+            # 部分网络流在收到第一帧之前拿不到分辨率
+            self._first = self._read()
+            if self._first is None:
+                raise StreamError(f"No frames received from stream: {spec}")
+            height, width = self._first.shape[:2]
+        self.size = (width, height)
+
+    def _read(self) -> Optional[np.ndarray]:
+        ret, frame = self.cap.read()
+        return frame if ret else None
+
+    def read(self) -> Optional[np.ndarray]:
+        if self._first is not None:
+            frame, self._first = self._first, None
+            return frame
+        return self._read()
+
+    def close(self):
+        self.cap.release()
+
+
+class StdinSource:
+    """从标准输入读取原始 BGR24 帧（如 ffmpeg -f rawvideo -pix_fmt bgr24 -），需事先给出分辨率"""
+
+    def __init__(self, size: Tuple[int, int], fps: float):
+        self.size = size
+        self.fps = fps
+        self._stream = sys.stdin.buffer
+        self._frame_bytes = size[0] * size[1] * 3
+
+    def read(self) -> Optional[np.ndarray]:
+        data = self._stream.read(self._frame_bytes)
+        if len(data) < self._frame_bytes:
+            return None
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.size[1], self.size[0], 3)
+
+    def close(self):
+        pass
+
+
+class SyntheticSource:
+    """
+    按帧率实时产生测试画面（移动的色块与帧号），用于在没有摄像头时验证延迟与丢帧行为。
+    realtime=False 时不等待，尽可能快地产生帧。
+    """
+
+    def __init__(self, size: Tuple[int, int], fps: float, realtime: bool = True):
+        self.size = size
+        self.fps = fps
+        self.realtime = realtime
+        self._index = 0
+        self._next = None
+
+    def read(self) -> Optional[np.ndarray]:
+        if self.realtime:
+            now = time.perf_counter()
+            if self._next is None:
+                self._next = now
+            elif self._next > now:
+                time.sleep(self._next - now)
+            self._next += 1.0 / self.fps
+
+        w, h = self.size
+        frame = np.full((h, w, 3), 64, dtype=np.uint8)
+        side = max(8, min(w, h) // 4)
+        x = int((w - side) * (0.5 + 0.5 * np.sin(self._index * 2 * np.pi / (4 * self.fps))))
+        y = (h - side) // 2
+        frame[y:y + side, x:x + side] = (0, 160, 255)
+        cv2.putText(frame, f"#{self._index + 1}", (10, h - 10), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.8, (255, 255, 255), 2)
+        self._index += 1
+        return frame
+
+    def close(self):
+        pass
+
+
+def parse_size(text: str) -> Tuple[int, int]:
+    try:
+        width, height = (int(v) for v in text.lower().split('x'))
+    except ValueError:
+        raise StreamError(f"Invalid frame size: {text} (expected WIDTHxHEIGHT)")
+    return width, height
+
+
+def open_source(spec: str, size: Optional[Tuple[int, int]] = None,
+                fps: Optional[float] = None):
+    """
+    '-' 为标准输入的原始帧，'synthetic' 为合成测试画面，纯数字为摄像头编号，
+    其余按地址或文件路径交给 OpenCV 打开
+    """
+    size = size or STREAM_CONFIG['size']
+    if spec == '-':
+        return StdinSource(size, fps or STREAM_CONFIG['fps'])
+    if spec == 'synthetic':
+        return SyntheticSource(size, fps or STREAM_CONFIG['fps'])
+    return CaptureSource(spec, fps)
+
+
+class FileSink:
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write(self, frame: np.ndarray) -> bool:
+        try:
+            self.writer.write(frame)
+        except EncoderError as e:
+            raise StreamError(str(e))
+        return True
+
+    def close(self):
+        self.writer.release()
+        if self.writer.error is not None:
+            raise StreamError(f"Encoder failed: {self.writer.error}")
+
+
+class StdoutSink:
+    """把原始 BGR24 帧写到标准输出，下游进程（如 ffmpeg/ffplay）关闭管道时停止"""
+
+    def __init__(self):
+        self._stream = sys.stdout.buffer
+
+    def write(self, frame: np.ndarray) -> bool:
+        try:
+            self._stream.write(memoryview(np.ascontiguousarray(frame)))
+            self._stream.flush()
+        except BrokenPipeError:
+            return False
+        return True
+
+    def close(self):
+        try:
+            self._stream.flush()
+        except BrokenPipeError:
+            pass
+
+
+class DisplaySink:
+    """在窗口中显示，按 q 或 Esc 停止"""
+
+    def __init__(self, title: str = 'PoseSim'):
+        self.title = title
+
+    def write(self, frame: np.ndarray) -> bool:
+        cv2.imshow(self.title, frame)
+        return cv2.waitKey(1) & 0xFF not in (ord('q'), 27)
+
+    def close(self):
+        cv2.destroyWindow(self.title)
+
+
+def open_sink(target: str, fps: float, size: Tuple[int, int],
+              open_writer: Callable):
+    """'-' 写到标准输出，'display' 显示窗口，其余为输出视频文件（由 open_writer 创建）"""
+    if target == '-':
+        return StdoutSink()
+    if target == 'display':
+        return DisplaySink()
+
+    writer = open_writer(target, fps, size)
+    if not writer.isOpened():
+        raise StreamError(f"Cannot create output video file: {target}")
+    return FileSink(writer)
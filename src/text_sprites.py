@@ -0,0 +1,117 @@
+from collections import OrderedDict
+from typing import Iterable, Tuple
+import cv2
+import numpy as np
+
+
+class TextSpriteCache:
+    """
+    文字精灵缓存：每个字符串第一次出现时用 cv2.putText 光栅化一次，保存笔画掩码、
+    纯色图块与 getTextSize 的结果，之后每次绘制只在笔画包围盒大小的 ROI 上做一次按掩码拷贝。
+    角度标注（0.0-180.0，精度 0.1°）与信息面板里不变的行会反复命中缓存，按最近最少使用淘汰；
+    帧号、进度这类每帧都变的文字缓存不会命中，绘制时传 cache=False 直接调用 putText。
+    角度标注连同半透明底框由 draw_label 一次查找完成，省去逐个标注的 getTextSize 与多次函数调用。
+
+    笔画与直接 putText 逐像素相同；文字触及画面边界时 OpenCV 会按裁剪后的线段重新光栅化，
+    此时退回直接调用 putText 以保持一致。capacity 为 0 时不缓存。
+    """
+
+    def __init__(self, font: int, scale: float, thickness: int, capacity: int):
+        self.font = font
+        self.scale = scale
+        self.thickness = thickness
+        self.capacity = max(0, capacity)
+        # 留出足够的边距容纳伸出排版框的笔画（下行字母、粗线宽）
+        self._pad = int(np.ceil(25 * scale)) + 2 * thickness + 2
+        self._entries = OrderedDict()
+
+    def _entry(self, text: str) -> list:
+        entry = self._entries.get(text)
+        if entry is not None:
+            self._entries.move_to_end(text)
+            return entry
+
+        (width, height), baseline = cv2.getTextSize(text, self.font, self.scale,
+                                                    self.thickness)
+        pad = self._pad
+        canvas = np.zeros((height + baseline + 2 * pad, width + 2 * pad), dtype=np.uint8)
+        cv2.putText(canvas, text, (pad, pad + height), self.font, self.scale, 255,
+                    self.thickness)
+
+        x, y, w, h = cv2.boundingRect(canvas)
+        mask = canvas[y:y + h, x:x + w].copy() if w > 0 else None
+        # [文字尺寸, 笔画包围盒相对文字原点的偏移, 掩码, 按颜色缓存的纯色图块]
+        entry = [(width, height), x - pad, y - pad - height, mask, {}]
+
+        self._entries[text] = entry
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+        return entry
+
+    def preload(self, texts: Iterable[str]):
+        """预先光栅化已知会出现的文字（如全部角度标注），避免首次出现时在逐帧路径上光栅化"""
+        if self.capacity == 0:
+            return
+        for text in texts:
+            self._entry(text)
+
+    def get_text_size(self, text: str) -> Tuple[int, int]:
+        if self.capacity == 0:
+            return cv2.getTextSize(text, self.font, self.scale, self.thickness)[0]
+        return self._entry(text)[0]
+
+    def draw_label(self, image: np.ndarray, text: str, org: Tuple[int, int],
+                   color: Tuple[int, int, int], box_alpha: float, box_pad: int = 2) -> bool:
+        """
+        带半透明底框的标注：底框为文字框向外扩 box_pad 像素，按 box_alpha 压暗后再绘制文字，
+        一次缓存查找完成。底框或文字触及画面边界时不绘制并返回 False，由调用方逐步绘制。
+        """
+        if self.capacity == 0:
+            return False
+        
+        (width, height), dx, dy, mask, tiles = self._entry(text)
+        h, w = image.shape[:2]
+        x0, y0 = org[0] - box_pad, org[1] - height - box_pad
+        x1, y1 = org[0] + width + box_pad + 1, org[1] + box_pad + 1
+        if x0 < 1 or y0 < 1 or x1 >= w or y1 >= h:
+            return False
+        
+        box = image[y0:y1, x0:x1]
+        cv2.convertScaleAbs(box, dst=box, alpha=1 - box_alpha)
+        if mask is not None:
+            tx, ty = org[0] + dx, org[1] + dy
+            if tx < 1 or ty < 1 or tx + mask.shape[1] >= w or ty + mask.shape[0] >= h:
+                cv2.putText(image, text, org, self.font, self.scale, color, self.thickness)
+            else:
+                cv2.copyTo(self._tile(tiles, mask, color), mask,
+                           image[ty:ty + mask.shape[0], tx:tx + mask.shape[1]])
+        return True
+
+    @staticmethod
+    def _tile(tiles: dict, mask: np.ndarray, color: Tuple[int, int, int]) -> np.ndarray:
+        tile = tiles.get(color)
+        if tile is None:
+            tile = np.empty(mask.shape + (3,), dtype=np.uint8)
+            tile[:] = color
+            tiles[color] = tile
+        return tile
+
+    def put_text(self, image: np.ndarray, text: str, org: Tuple[int, int],
+                 color: Tuple[int, int, int], cache: bool = True):
+        """与 cv2.putText(image, text, org, font, scale, color, thickness) 结果相同，原地绘制"""
+        if self.capacity == 0 or not cache:
+            cv2.putText(image, text, org, self.font, self.scale, color, self.thickness)
+            return
+
+        _, dx, dy, mask, tiles = self._entry(text)
+        if mask is None:
+            return
+
+        x0, y0 = org[0] + dx, org[1] + dy
+        x1, y1 = x0 + mask.shape[1], y0 + mask.shape[0]
+        # 笔画端点可能落在边缘像素之外半个像素内，贴边时同样会被裁剪，留出 1 像素余量
+        if x0 < 1 or y0 < 1 or x1 >= image.shape[1] or y1 >= image.shape[0]:
+            cv2.putText(image, text, org, self.font, self.scale, color, self.thickness)
+            return
+
+        cv2.copyTo(self._tile(tiles, mask, color), mask, image[y0:y1, x0:x1])
@@ -1,95 +1,650 @@
 import cv2
 import os
-from typing import Optional
+import sys
+import threading
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
 from tqdm import tqdm
 from pose_estimator import PoseEstimator
 from visualizer import PoseVisualizer
-from config import VIDEO_CONFIG
+from pipeline import FramePacket, FramePipeline, FramePool
+from landmark_store import LandmarkStore, LandmarkStoreWriter, sidecar_path_for
+from analytics import AnalyticsWriter
+from keyframes import KeyframeScheduler, interpolate_landmarks
+from adaptive_estimator import ComplexityLog, complexity_log_path_for
+from streaming import FrameBuffer, StreamError, open_sink
+from writers import EncoderError, open_writer
+from renditions import RenditionSet
+from profiler import NULL_PROFILER
+from config import VIDEO_CONFIG, STREAM_CONFIG
+
+
+class VideoProcessingError(Exception):
+    pass
 
 
 class VideoProcessor:
     
-    def __init__(self, pose_estimator: PoseEstimator, visualizer: PoseVisualizer):
+    def __init__(self, pose_estimator: Optional[PoseEstimator], visualizer: PoseVisualizer,
+                 config: Optional[Dict] = None, profiler=None):
         self.estimator = pose_estimator
         self.visualizer = visualizer
-        self.config = VIDEO_CONFIG
+        self.config = config or VIDEO_CONFIG
+        self.profiler = profiler or NULL_PROFILER
+        
+        # 同一个计时器贯穿解码、推理、绘制、编码各阶段
+        if profiler is not None:
+            for component in (pose_estimator, visualizer):
+                if component is not None:
+                    component.profiler = profiler
     
-    def process_video(self, input_path: str, output_path: str) -> bool:
-        if not os.path.exists(input_path):
-            print(f"Error: Input video file does not exist: {input_path}")
+    def process_video(self, input_path: str, output_path: str,
+                      pipelined: Optional[bool] = None,
+                      landmark_source: Optional[str] = None,
+                      renditions: Optional[List[Dict]] = None) -> bool:
+        try:
+            stats = self.run_video(input_path, output_path, pipelined, verbose=True,
+                                   landmark_source=landmark_source, renditions=renditions)
+        except VideoProcessingError as e:
+            print(f"Error: {str(e)}")
             return False
         
+        print(f"\nProcessing completed")
+        print(f"  Successfully processed: {stats['success']} frames")
+        if stats['fail'] > 0:
+            print(f"  Failed: {stats['fail']} frames")
+        print(f"  Output file: {output_path}")
+        for rendition in stats.get('renditions', []):
+            print(f"  Rendition: {rendition['output']} ({rendition['size'][0]}x"
+                  f"{rendition['size'][1]}, {rendition['frames']} frames)")
+        if stats['landmarks_path']:
+            print(f"  Landmarks file: {stats['landmarks_path']}")
+        self._print_complexity(stats)
+        print()
+        
+        return True
+    
+    def run_video(self, input_path: str, output_path: str,
+                  pipelined: Optional[bool] = None, verbose: bool = False,
+                  frame_range: Optional[Tuple[int, int]] = None, warmup: int = 0,
+                  codec: Optional[str] = None, landmarks_path: Optional[str] = None,
+                  landmark_source: Optional[str] = None,
+                  renditions: Optional[List[Dict]] = None) -> Dict:
+        """
+        renditions 为附加输出（见 renditions.parse_rendition），与主输出共用同一次解码、推理和绘制，
+        各自缩放、抽帧后并行编码
+        """
+        if not os.path.exists(input_path):
+            raise VideoProcessingError(f"Input video file does not exist: {input_path}")
+        
+        # 仅渲染模式：关键点取自已保存的列式文件，不执行推理
+        store = None
+        if landmark_source is not None:
+            try:
+                store = LandmarkStore(landmark_source)
+            except (OSError, ValueError) as e:
+                raise VideoProcessingError(f"Cannot read landmarks file: {str(e)}")
+        elif landmarks_path is None and self.config.get('save_landmarks', False):
+            landmarks_path = sidecar_path_for(output_path)
+        
         cap = cv2.VideoCapture(input_path)
         if not cap.isOpened():
-            print(f"Error: Cannot open video file: {input_path}")
-            return False
+            raise VideoProcessingError(f"Cannot open video file: {input_path}")
         
         fps = cap.get(cv2.CAP_PROP_FPS)
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
-        print(f"\nVideo information:")
-        print(f"  Resolution: {width}x{height}")
-        print(f"  Frame rate: {fps:.2f} FPS")
-        print(f"  Total frames: {total_frames}")
-        print(f"  Duration: {total_frames/fps:.2f} seconds\n")
+        if verbose:
+            print(f"\nVideo information:")
+            print(f"  Resolution: {width}x{height}")
+            print(f"  Frame rate: {fps:.2f} FPS")
+            print(f"  Total frames: {total_frames}")
+            print(f"  Duration: {total_frames/fps:.2f} seconds\n")
+        
+        if store is not None and (store.width, store.height) != (width, height):
+            cap.release()
+            raise VideoProcessingError(
+                f"Landmarks file was recorded at {store.width}x{store.height}, "
+                f"video is {width}x{height}")
+        
+        # 只处理 [start, end) 区间时，从 start 之前 warmup 帧开始解码推理，
+        # 让跟踪/平滑状态在正式输出前收敛，这些预热帧不写入输出
+        start, end = 0, None
+        if frame_range is not None:
+            start, end = frame_range
+            decode_from = max(0, start - warmup)
+            if decode_from > 0:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, decode_from)
+        else:
+            decode_from = 0
         
         output_fps = self.config['output_fps'] or fps
         
-        fourcc = cv2.VideoWriter_fourcc(*self.config['output_codec'])
-        out = cv2.VideoWriter(output_path, fourcc, output_fps, (width, height))
+        out = self._open_writer(output_path, output_fps, (width, height), codec)
         
         if not out.isOpened():
-            print(f"Error: Cannot create output video file: {output_path}")
             cap.release()
+            raise VideoProcessingError(f"Cannot create output video file: {output_path}")
+        
+        landmarks_out = None
+        if landmarks_path is not None:
+            try:
+                landmarks_out = LandmarkStoreWriter(landmarks_path, fps, width, height)
+            except OSError as e:
+                cap.release()
+                out.release()
+                raise VideoProcessingError(f"Cannot create landmarks file: {str(e)}")
+        
+        complexity_log = None
+        if store is None and self.estimator.adaptive:
+            try:
+                complexity_log = ComplexityLog(complexity_log_path_for(output_path))
+            except OSError as e:
+                cap.release()
+                out.release()
+                if landmarks_out is not None:
+                    landmarks_out.close()
+                raise VideoProcessingError(f"Cannot create complexity log: {str(e)}")
+        
+        rendition_set = None
+        if renditions:
+            try:
+                rendition_set = RenditionSet(renditions, (width, height), output_fps, self.config)
+            except (EncoderError, OSError) as e:
+                cap.release()
+                out.release()
+                if landmarks_out is not None:
+                    landmarks_out.close()
+                if complexity_log is not None:
+                    complexity_log.close()
+                raise VideoProcessingError(str(e))
+        
+        if pipelined is None:
+            pipelined = self.config.get('pipeline', False)
+        
+        pbar = None
+        if self.config['show_progress']:
+            pbar_total = (end if end is not None else total_frames) - start
+            pbar = tqdm(total=pbar_total, desc="Processing", unit="frames")
+        
+        stats = {'success': 0, 'fail': 0, 'first_error': None,
+                 'landmarks_path': landmarks_path}
+        profiler = self.profiler
+        pool = FramePool((height, width, 3))
+        
+        def release(frame, output):
+            pool.release(frame)
+            if output is not frame:
+                pool.release(output)
+        
+        def encode(packet: FramePacket):
+            # 先交给各路附加输出，它们的缩放、编码与下面主输出的编码并行进行
+            shared = None
+            if rendition_set is not None and not packet.warmup:
+                frame, output = packet.frame, packet.output
+                shared = rendition_set.submit(packet.index, frame, output, packet.error,
+                                              lambda: release(frame, output))
+            try:
+                write(packet)
+            finally:
+                # 写出后解码帧与输出帧都归还给缓冲区池（有附加输出时等各路都用完）
+                if shared is not None:
+                    shared.done()
+                else:
+                    release(packet.frame, packet.output)
+                packet.frame = packet.output = None
+        
+        def write(packet: FramePacket):
+            if packet.warmup:
+                return
+            
+            if landmarks_out is not None:
+                landmarks_out.append(packet.landmarks)
+            if complexity_log is not None:
+                complexity_log.append(packet.index, packet.complexity)
+            
+            if packet.error is None:
+                try:
+                    with profiler.measure('encode'):
+                        out.write(packet.output)
+                    stats['success'] += 1
+                except EncoderError:
+                    raise
+                except Exception as e:
+                    packet.error = e
+            
+            if packet.error is not None:
+                if verbose:
+                    print(f"\nWarning: Error processing frame {packet.index}: {str(packet.error)}")
+                if stats['first_error'] is None:
+                    stats['first_error'] = f"frame {packet.index}: {str(packet.error)}"
+                try:
+                    out.write(packet.frame)
+                except Exception:
+                    pass
+                stats['fail'] += 1
+            
+            profiler.record_latency(time.perf_counter() - packet.started)
+            if pbar is not None:
+                pbar.update(1)
+        
+        def render(packet: FramePacket) -> FramePacket:
+            if packet.error is not None or packet.warmup:
+                return packet
+            out_buffer = pool.acquire()
+            if out_buffer.shape != packet.frame.shape:
+                out_buffer = np.empty_like(packet.frame)
+            return self._render_packet(packet, total_frames, fps, out_buffer)
+        
+        started = time.perf_counter()
+        
+        source = self._decode_frames(cap, decode_from, start, end, pool)
+        if store is not None:
+            def infer(packet: FramePacket) -> FramePacket:
+                packet.landmarks = store.get(packet.index - 1)
+                return packet
+            stages = [infer, render]
+        elif self._keyframe_stride() > 1:
+            source = self._infer_keyframes(source)
+            stages = [render]
+        else:
+            stages = [self._infer_packet, render]
+        
+        try:
+            if pipelined:
+                pipeline = FramePipeline(stages, self.config.get('queue_size', 8))
+                pipeline.run(source, encode)
+            else:
+                for packet in source:
+                    for stage in stages:
+                        packet = stage(packet)
+                    encode(packet)
+        except EncoderError as e:
+            raise VideoProcessingError(str(e))
+        finally:
+            if pbar is not None:
+                pbar.close()
+            
+            cap.release()
+            out.release()
+            if rendition_set is not None:
+                stats['renditions'] = rendition_set.close()
+            if landmarks_out is not None:
+                landmarks_out.close()
+            if complexity_log is not None:
+                complexity_log.close()
+                stats['complexity_log'] = complexity_log.path
+                stats['complexity_counts'] = complexity_log.counts
+            profiler.add_run(stats['success'] + stats['fail'],
+                             time.perf_counter() - started)
+            stats['frame_buffers'] = pool.allocated
+        
+        if out.error is not None:
+            raise VideoProcessingError(f"Encoder failed: {out.error}")
+        for rendition in stats.get('renditions', []):
+            if rendition['error'] is not None:
+                raise VideoProcessingError(f"Rendition {rendition['output']} failed: "
+                                           f"{rendition['error']}")
+        
+        return stats
+    
+    def analyze_video(self, input_path: str, table_path: str,
+                      pipelined: Optional[bool] = None) -> bool:
+        try:
+            stats = self.run_headless(input_path, table_path, pipelined, verbose=True)
+        except VideoProcessingError as e:
+            print(f"Error: {str(e)}")
             return False
         
-        frame_num = 0
+        print(f"\nAnalysis completed")
+        print(f"  Frames: {stats['success']} ({stats['detected']} with a detected pose)")
+        if stats['fail'] > 0:
+            print(f"  Failed: {stats['fail']} frames")
+        print(f"  Table file: {table_path}")
+        self._print_complexity(stats)
+        print()
+        
+        return True
+    
+    def run_headless(self, input_path: str, table_path: str,
+                     pipelined: Optional[bool] = None, verbose: bool = False,
+                     landmarks_path: Optional[str] = None,
+                     landmark_source: Optional[str] = None) -> Dict:
+        """
+        只解码和推理，把每帧关键点与关节角度写成表格，不渲染、不编码、不分配输出帧。
+        给出 landmark_source 时直接从关键点文件生成表格，连视频都不解码。
+        """
+        if not os.path.exists(input_path):
+            raise VideoProcessingError(f"Input video file does not exist: {input_path}")
+        
+        stats = {'success': 0, 'fail': 0, 'detected': 0, 'first_error': None,
+                 'landmarks_path': landmarks_path}
+        
+        if landmark_source is not None:
+            try:
+                store = LandmarkStore(landmark_source)
+                table = AnalyticsWriter(table_path, store.fps, store.width, store.height)
+            except (OSError, ValueError, ImportError) as e:
+                raise VideoProcessingError(str(e))
+            with table:
+                for index in range(len(store)):
+                    table.append(index + 1, store.get(index))
+            stats['success'] = len(store)
+            stats['detected'] = int(store.detected.sum())
+            return stats
         
+        cap = cv2.VideoCapture(input_path)
+        if not cap.isOpened():
+            raise VideoProcessingError(f"Cannot open video file: {input_path}")
+        
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        
+        if verbose:
+            print(f"\nVideo information:")
+            print(f"  Resolution: {width}x{height}")
+            print(f"  Frame rate: {fps:.2f} FPS")
+            print(f"  Total frames: {total_frames}\n")
+        
+        try:
+            table = AnalyticsWriter(table_path, fps, width, height)
+            landmarks_out = None
+            if landmarks_path is not None:
+                landmarks_out = LandmarkStoreWriter(landmarks_path, fps, width, height)
+            complexity_log = None
+            if self.estimator.adaptive:
+                complexity_log = ComplexityLog(complexity_log_path_for(table_path))
+        except (OSError, ImportError) as e:
+            cap.release()
+            raise VideoProcessingError(f"Cannot create output file: {str(e)}")
+        
+        if pipelined is None:
+            pipelined = self.config.get('pipeline', False)
+        
+        pbar = None
         if self.config['show_progress']:
-            pbar = tqdm(total=total_frames, desc="Processing", unit="frames")
+            pbar = tqdm(total=total_frames, desc="Analyzing", unit="frames")
         
-        success_count = 0
-        fail_count = 0
+        pool = FramePool((height, width, 3))
         
-        while cap.isOpened():
-            ret, frame = cap.read()
+        def collect(packet: FramePacket):
+            pool.release(packet.frame)
+            packet.frame = None
+            
+            if packet.error is not None:
+                if verbose:
+                    print(f"\nWarning: Error processing frame {packet.index}: {str(packet.error)}")
+                if stats['first_error'] is None:
+                    stats['first_error'] = f"frame {packet.index}: {str(packet.error)}"
+                stats['fail'] += 1
+            else:
+                stats['success'] += 1
+                if packet.landmarks is not None:
+                    stats['detected'] += 1
             
+            table.append(packet.index, packet.landmarks)
+            if landmarks_out is not None:
+                landmarks_out.append(packet.landmarks)
+            if complexity_log is not None:
+                complexity_log.append(packet.index, packet.complexity)
+            
+            self.profiler.record_latency(time.perf_counter() - packet.started)
+            if pbar is not None:
+                pbar.update(1)
+        
+        source = self._decode_frames(cap, pool=pool)
+        stages = [self._infer_packet]
+        if self._keyframe_stride() > 1:
+            source = self._infer_keyframes(source)
+            stages = []
+        
+        started = time.perf_counter()
+        try:
+            if pipelined:
+                pipeline = FramePipeline(stages, self.config.get('queue_size', 8))
+                pipeline.run(source, collect)
+            else:
+                for packet in source:
+                    for stage in stages:
+                        packet = stage(packet)
+                    collect(packet)
+        finally:
+            if pbar is not None:
+                pbar.close()
+            
+            cap.release()
+            table.close()
+            if landmarks_out is not None:
+                landmarks_out.close()
+            if complexity_log is not None:
+                complexity_log.close()
+                stats['complexity_log'] = complexity_log.path
+                stats['complexity_counts'] = complexity_log.counts
+            self.profiler.add_run(stats['success'] + stats['fail'],
+                                  time.perf_counter() - started)
+            stats['frame_buffers'] = pool.allocated
+        
+        return stats
+    
+    @staticmethod
+    def _print_complexity(stats: Dict):
+        if not stats.get('complexity_log'):
+            return
+        counts = ", ".join(f"{level}: {count}"
+                           for level, count in sorted(stats['complexity_counts'].items()))
+        print(f"  Frames per complexity: {counts}")
+        print(f"  Complexity log: {stats['complexity_log']}")
+    
+    def _open_writer(self, output_path: str, fps: float, size,
+                     codec: Optional[str] = None):
+        return open_writer(output_path, fps, size, self.config, codec)
+    
+    def _decode_frames(self, cap: cv2.VideoCapture, first: int = 0,
+                       start: int = 0, end: Optional[int] = None,
+                       pool: Optional[FramePool] = None):
+        """给出 pool 时解码到池中的缓冲区，由消费方在用完后归还"""
+        frame_num = first
+        while cap.isOpened() and (end is None or frame_num < end):
+            started = time.perf_counter()
+            buffer = pool.acquire() if pool is not None else None
+            with self.profiler.measure('decode'):
+                ret, frame = cap.read(image=buffer)
+            
+            if pool is not None and (not ret or frame is not buffer):
+                pool.release(buffer)
             if not ret:
                 break
             
             frame_num += 1
-            
+            yield FramePacket(frame_num, frame, warmup=frame_num <= start, started=started)
+    
+    def _infer_packet(self, packet: FramePacket) -> FramePacket:
+        try:
+            packet.results = self.estimator.estimate(packet.frame)
+            packet.complexity = self.estimator.complexity
+            with self.profiler.measure('landmarks'):
+                packet.landmarks = self.estimator.get_landmark_array(packet.results)
+        except Exception as e:
+            packet.error = e
+        return packet
+    
+    def process_stream(self, source, output: str, max_latency: Optional[float] = None,
+                       max_frames: Optional[int] = None) -> bool:
+        # 输出写到标准输出时，提示信息改写到标准错误，避免混入视频数据
+        log = sys.stderr if output == '-' else sys.stdout
+        try:
+            stats = self.run_stream(source, output, max_latency, max_frames)
+        except (StreamError, VideoProcessingError) as e:
+            print(f"Error: {str(e)}", file=log)
+            return False
+        
+        print(f"\nStream ended", file=log)
+        print(f"  Captured: {stats['captured']} frames", file=log)
+        print(f"  Processed: {stats['success']} frames ({stats['fps']:.1f} FPS)", file=log)
+        print(f"  Dropped: {stats['dropped']} frames", file=log)
+        if stats['fail'] > 0:
+            print(f"  Failed: {stats['fail']} frames", file=log)
+        if stats['latency_ms']:
+            latency = stats['latency_ms']
+            print(f"  Latency: p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, "
+                  f"max {latency['max']:.1f} ms", file=log)
+        print(file=log)
+        return True
+    
+    def run_stream(self, source, output: str, max_latency: Optional[float] = None,
+                   max_frames: Optional[int] = None) -> Dict:
+        """
+        处理实时流：采集线程把帧放入丢弃最旧帧的有界队列，主线程逐帧推理、绘制并写出。
+        取帧时丢弃已等待超过 (max_latency - 近期单帧处理耗时) 的帧，使端到端延迟保持在
+        max_latency 秒以内；处理速度跟不上时输出的是最新画面，而不是积压的旧帧。
+        Ctrl+C、源结束、显示窗口中按 q 或达到 max_frames 时停止。
+        """
+        if max_latency is None:
+            max_latency = STREAM_CONFIG['max_latency_ms'] / 1000.0
+        
+        fps = source.fps
+        sink = open_sink(output, fps, source.size, self._open_writer)
+        buffer = FrameBuffer(STREAM_CONFIG['capture_queue'])
+        stop = threading.Event()
+        errors = []
+        stats = {'captured': 0, 'success': 0, 'fail': 0, 'dropped': 0,
+                 'first_error': None, 'fps': 0.0, 'latency_ms': None}
+        
+        def capture():
             try:
-                results = self.estimator.estimate(frame)
-                output_frame = self.visualizer.visualize_pose(
-                    frame, results, frame_num, total_frames, fps
-                )
-                out.write(output_frame)
-                success_count += 1
-                
+                while not stop.is_set() and (max_frames is None or
+                                             stats['captured'] < max_frames):
+                    frame = source.read()
+                    if frame is None:
+                        break
+                    stats['captured'] += 1
+                    buffer.put(FramePacket(stats['captured'], frame,
+                                           started=time.perf_counter()))
             except Exception as e:
-                print(f"\nWarning: Error processing frame {frame_num}: {str(e)}")
-                out.write(frame)
-                fail_count += 1
-            
-            if self.config['show_progress']:
-                pbar.update(1)
+                errors.append(e)
+            finally:
+                buffer.close()
         
-        if self.config['show_progress']:
-            pbar.close()
+        thread = threading.Thread(target=capture, name='stream-capture', daemon=True)
+        latencies = []
+        processing = 0.0
+        out_buffer = None
+        profiler = self.profiler
+        started = time.perf_counter()
+        thread.start()
         
-        cap.release()
-        out.release()
+        try:
+            while True:
+                packet = buffer.get(max(0.0, max_latency - processing))
+                if packet is None:
+                    break
+                
+                begin = time.perf_counter()
+                if out_buffer is None or out_buffer.shape != packet.frame.shape:
+                    out_buffer = np.empty_like(packet.frame)
+                self._infer_packet(packet)
+                self._render_packet(packet, 0, fps, out_buffer)
+                
+                if packet.error is None:
+                    stats['success'] += 1
+                    frame = packet.output
+                else:
+                    if stats['first_error'] is None:
+                        stats['first_error'] = f"frame {packet.index}: {str(packet.error)}"
+                    stats['fail'] += 1
+                    frame = packet.frame
+                with profiler.measure('encode'):
+                    keep = sink.write(frame)
+                
+                now = time.perf_counter()
+                processing += 0.1 * ((now - begin) - processing)
+                latencies.append(now - packet.started)
+                profiler.record_latency(now - packet.started)
+                if not keep:
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop.set()
+            buffer.close()
+            thread.join(timeout=1.0)
+            source.close()
+            sink.close()
+            elapsed = time.perf_counter() - started
+            profiler.add_run(stats['success'] + stats['fail'], elapsed)
         
-        print(f"\nProcessing completed")
-        print(f"  Successfully processed: {success_count} frames")
-        if fail_count > 0:
-            print(f"  Failed: {fail_count} frames")
-        print(f"  Output file: {output_path}\n")
+        if errors:
+            raise StreamError(f"Stream capture failed: {str(errors[0])}")
         
-        return True
+        processed = stats['success'] + stats['fail']
+        stats['dropped'] = buffer.dropped
+        stats['fps'] = processed / elapsed if elapsed > 0 else 0.0
+        if latencies:
+            values = np.array(latencies) * 1000.0
+            stats['latency_ms'] = {'p50': float(np.percentile(values, 50)),
+                                   'p95': float(np.percentile(values, 95)),
+                                   'max': float(values.max())}
+        return stats
+    
+    def _keyframe_stride(self) -> int:
+        if self.estimator is None:
+            return 1
+        return max(1, int(self.estimator.inference_config['keyframe_stride'] or 1))
+    
+    def _infer_keyframes(self, packets):
+        """
+        每隔 stride 帧推理一次，中间帧的关键点由前后两个关键帧插值得到，所有帧仍按顺序输出。
+        中间帧要等下一个关键帧推理完成才能插值，因此最多缓存 stride-1 帧；最后一帧总是关键帧。
+        """
+        config = self.estimator.inference_config
+        scheduler = KeyframeScheduler(config['keyframe_stride'], config['adaptive_stride'],
+                                      config['stride_motion_threshold'])
+        previous = None
+        pending = []
+        
+        for packet in packets:
+            if previous is not None and len(pending) + 1 < scheduler.stride:
+                pending.append(packet)
+                continue
+            
+            self._infer_packet(packet)
+            if previous is not None:
+                self._interpolate_packets(previous, pending, packet, scheduler)
+            yield from pending
+            yield packet
+            previous, pending = packet, []
+        
+        if pending:
+            last = self._infer_packet(pending.pop())
+            self._interpolate_packets(previous, pending, last, scheduler)
+            yield from pending
+            yield last
+    
+    def _interpolate_packets(self, start: FramePacket, pending, end: FramePacket,
+                             scheduler: KeyframeScheduler):
+        with self.profiler.measure('interpolate'):
+            frames = interpolate_landmarks(start.landmarks, end.landmarks, len(pending))
+            for packet, landmarks in zip(pending, frames):
+                packet.landmarks = landmarks
+            scheduler.update(start.landmarks, end.landmarks, len(pending) + 1)
+    
+    def _render_packet(self, packet: FramePacket, total_frames: int,
+                       fps: float, out: Optional[np.ndarray] = None) -> FramePacket:
+        if packet.error is not None or packet.warmup:
+            return packet
+        
+        try:
+            packet.output = self.visualizer.visualize_landmarks(
+                packet.frame, packet.landmarks, packet.index, total_frames, fps, out
+            )
+        except Exception as e:
+            packet.error = e
+        return packet
     
     def process_frame(self, frame) -> Optional[object]:
         try:
@@ -100,20 +655,22 @@ class VideoProcessor:
             print(f"Error processing frame: {str(e)}")
             return None
     
-    def get_video_info(self, video_path: str) -> Optional[dict]:
+    @staticmethod
+    def get_video_info(video_path: str) -> Optional[dict]:
         cap = cv2.VideoCapture(video_path)
         
         if not cap.isOpened():
             return None
         
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
         info = {
-            'fps': cap.get(cv2.CAP_PROP_FPS),
+            'fps': fps,
             'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
             'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
-            'frame_count': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
-            'duration': cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS)
+            'frame_count': int(frame_count),
+            'duration': frame_count / fps if fps else 0.0
         }
         
         cap.release()
         return info
-
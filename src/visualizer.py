@@ -1,38 +1,73 @@
 import cv2
 import numpy as np
 from typing import Dict, List, Tuple, Optional
-from config import VISUALIZATION_CONFIG, POSE_CONNECTIONS, ANGLES_TO_DISPLAY
+from config import VISUALIZATION_CONFIG, POSE_CONNECTIONS, ANGLES_TO_DISPLAY, LANDMARK_NAMES
 from pose_estimator import PoseEstimator
+from angles import AngleEngine
+from profiler import NULL_PROFILER
+from text_sprites import TextSpriteCache
 
 
 class PoseVisualizer:
     
-    def __init__(self, pose_estimator: PoseEstimator, config: Optional[Dict] = None):
+    def __init__(self, pose_estimator: Optional[PoseEstimator] = None,
+                 config: Optional[Dict] = None):
         self.estimator = pose_estimator
         self.config = config or VISUALIZATION_CONFIG
+        
+        # 仅渲染（不做推理）时可以不传入估计器，关键点名称取自配置
+        if pose_estimator is not None:
+            self.landmark_names = pose_estimator.landmark_names
+        else:
+            self.landmark_names = LANDMARK_NAMES
+        self.landmark_dict = {name: idx for idx, name in enumerate(self.landmark_names)}
+        
+        index = self.landmark_dict
+        self.connection_indices = [(index[a], index[b]) for a, b in POSE_CONNECTIONS]
+        self.angle_engine = AngleEngine(index)
+        self.text = TextSpriteCache(self.config['text_font'], self.config['text_scale'],
+                                    self.config['text_thickness'],
+                                    self.config.get('text_cache_size', 0))
+        # 关节角度在 0-180° 之间、保留一位小数，全部标注只有 1801 种
+        self.text.preload(self._angle_label(i / 10) for i in range(1801))
+        self.profiler = NULL_PROFILER
+    
+    def _landmarks_to_points(self, landmarks: Dict[str, Tuple[int, int]]
+                             ) -> Tuple[np.ndarray, np.ndarray]:
+        num = len(self.landmark_names)
+        points = np.zeros((num, 2), dtype=np.int32)
+        visible = np.zeros(num, dtype=bool)
+        for name, coords in landmarks.items():
+            idx = self.landmark_dict[name]
+            points[idx] = coords
+            visible[idx] = True
+        return points, visible
     
     def draw_skeleton(self, image: np.ndarray, 
                      landmarks: Dict[str, Tuple[int, int]]) -> np.ndarray:
+        return self.draw_skeleton_points(image, *self._landmarks_to_points(landmarks))
+    
+    def draw_skeleton_points(self, image: np.ndarray, points: np.ndarray,
+                             visible: np.ndarray) -> np.ndarray:
         output = image.copy()
+        self._draw_skeleton_inplace(output, points, visible)
+        return output
+    
+    def _draw_skeleton_inplace(self, output: np.ndarray, points: np.ndarray,
+                               visible: np.ndarray):
+        coords = points.tolist()
         
-        for connection in POSE_CONNECTIONS:
-            point1_name, point2_name = connection
-            
-            if point1_name in landmarks and point2_name in landmarks:
-                point1 = landmarks[point1_name]
-                point2 = landmarks[point2_name]
-                
-                cv2.line(output, point1, point2,
+        for idx1, idx2 in self.connection_indices:
+            if visible[idx1] and visible[idx2]:
+                cv2.line(output, coords[idx1], coords[idx2],
                         self.config['skeleton_color'],
                         self.config['skeleton_thickness'])
         
-        for point_name, coords in landmarks.items():
-            cv2.circle(output, coords,
+        for idx in np.flatnonzero(visible):
+            cv2.circle(output, coords[idx],
                       self.config['landmark_radius'],
                       self.config['landmark_color'],
                       -1)
-        
-        return output
     
     def draw_angle_arc(self, image: np.ndarray, center: Tuple[int, int],
                       angle: float, start_point: Tuple[int, int],
@@ -52,85 +87,120 @@ class PoseVisualizer:
     
     def draw_angles(self, image: np.ndarray,
                    landmarks: Dict[str, Tuple[int, int]]) -> np.ndarray:
+        return self.draw_angles_points(image, *self._landmarks_to_points(landmarks))
+    
+    def draw_angles_points(self, image: np.ndarray, points: np.ndarray,
+                           visible: np.ndarray) -> np.ndarray:
         output = image.copy()
+        self._draw_angles_inplace(output, points, visible)
+        return output
+    
+    def _draw_angles_inplace(self, output: np.ndarray, points: np.ndarray,
+                             visible: np.ndarray):
+        angles = self.angle_engine.compute(points)
+        shown = visible[self.angle_engine.triplets].all(axis=1)
         
-        for angle_info in ANGLES_TO_DISPLAY:
-            point_names = angle_info['points']
+        for angle, pos_idx in zip(angles[shown], self.angle_engine.positions[shown]):
+            label_pos = points[pos_idx].tolist()
+            
+            text = self._angle_label(angle)
+            text_x = label_pos[0] + 15
+            text_y = label_pos[1] - 15
             
-            if all(name in landmarks for name in point_names):
-                point1 = landmarks[point_names[0]]
-                point2 = landmarks[point_names[1]]
-                point3 = landmarks[point_names[2]]
-                
-                angle = self.estimator.calculate_angle(point1, point2, point3)
-                label_pos = landmarks[angle_info['position']]
-                
-                text = f"{angle:.1f}°"
-                text_size = cv2.getTextSize(text, self.config['text_font'],
-                                           self.config['text_scale'],
-                                           self.config['text_thickness'])[0]
-                
-                text_x = label_pos[0] + 15
-                text_y = label_pos[1] - 15
-                
-                overlay = output.copy()
-                cv2.rectangle(overlay,
-                            (text_x - 2, text_y - text_size[1] - 2),
-                            (text_x + text_size[0] + 2, text_y + 2),
-                            (0, 0, 0), -1)
-                cv2.addWeighted(overlay, 0.6, output, 0.4, 0, output)
-                
-                cv2.putText(output, text,
-                          (text_x, text_y),
-                          self.config['text_font'],
-                          self.config['text_scale'],
-                          self.config['angle_color'],
-                          self.config['text_thickness'])
+            if self.text.draw_label(output, text, (text_x, text_y),
+                                    self.config['angle_color'], 0.6):
+                continue
+            
+            text_size = self.text.get_text_size(text)
+            self._darken_box(output, (text_x - 2, text_y - text_size[1] - 2),
+                             (text_x + text_size[0] + 2, text_y + 2), 0.6)
+            
+            self.text.put_text(output, text, (text_x, text_y), self.config['angle_color'])
+    
+    @staticmethod
+    def _angle_label(angle: float) -> str:
+        return f"{angle:.1f}°"
+    
+    @staticmethod
+    def _darken_box(output: np.ndarray, top_left: Tuple[int, int],
+                    bottom_right: Tuple[int, int], alpha: float):
+        # 与整帧叠加黑色矩形再 addWeighted 等价，但只处理矩形区域（两端包含）
+        h, w = output.shape[:2]
+        x0, y0 = max(0, top_left[0]), max(0, top_left[1])
+        x1, y1 = min(w, bottom_right[0] + 1), min(h, bottom_right[1] + 1)
+        if x0 >= x1 or y0 >= y1:
+            return
         
-        return output
+        roi = output[y0:y1, x0:x1]
+        cv2.convertScaleAbs(roi, dst=roi, alpha=1 - alpha)
     
     def draw_info_panel(self, image: np.ndarray, frame_num: int,
                        total_frames: int, fps: float) -> np.ndarray:
         output = image.copy()
-        h, w = output.shape[:2]
-        
-        overlay = output.copy()
+        self._draw_info_panel_inplace(output, frame_num, total_frames, fps)
+        return output
+    
+    def _draw_info_panel_inplace(self, output: np.ndarray, frame_num: int,
+                                 total_frames: int, fps: float):
         panel_height = 80
-        cv2.rectangle(overlay, (10, 10), (300, 10 + panel_height),
-                     (0, 0, 0), -1)
-        cv2.addWeighted(overlay, self.config['info_box_alpha'],
-                       output, 1 - self.config['info_box_alpha'], 0, output)
-        
-        info_texts = [
-            f"Frame: {frame_num}/{total_frames}",
-            f"FPS: {fps:.1f}",
-            f"Progress: {frame_num/total_frames*100:.1f}%"
-        ]
+        self._darken_box(output, (10, 10), (300, 10 + panel_height),
+                         self.config['info_box_alpha'])
+        
+        # 实时流没有总帧数，只显示帧号。帧号与进度每帧都不同，不经过文字缓存
+        if total_frames > 0:
+            info_texts = [
+                (f"Frame: {frame_num}/{total_frames}", False),
+                (f"FPS: {fps:.1f}", True),
+                (f"Progress: {frame_num/total_frames*100:.1f}%", False)
+            ]
+        else:
+            info_texts = [
+                (f"Frame: {frame_num}", False),
+                (f"FPS: {fps:.1f}", True),
+                ("Live", True)
+            ]
         
         y_offset = 30
-        for text in info_texts:
-            cv2.putText(output, text, (20, y_offset),
-                       self.config['text_font'],
-                       self.config['text_scale'],
-                       self.config['text_color'],
-                       self.config['text_thickness'])
+        for text, cache in info_texts:
+            self.text.put_text(output, text, (20, y_offset), self.config['text_color'], cache)
             y_offset += 20
-        
-        return output
     
     def visualize_pose(self, image: np.ndarray, results: object,
                       frame_num: int = 0, total_frames: int = 0,
-                      fps: float = 30.0) -> np.ndarray:
-        output = image.copy()
-        
-        h, w = image.shape[:2]
-        landmarks = self.estimator.get_all_landmarks(results, (h, w))
-        
-        if landmarks:
-            output = self.draw_skeleton(output, landmarks)
-            output = self.draw_angles(output, landmarks)
-        
-        output = self.draw_info_panel(output, frame_num, total_frames, fps)
+                      fps: float = 30.0, out: Optional[np.ndarray] = None) -> np.ndarray:
+        landmarks = self.estimator.get_landmark_array(results)
+        return self.visualize_landmarks(image, landmarks, frame_num, total_frames, fps, out)
+    
+    def visualize_landmarks(self, image: np.ndarray, landmarks: Optional[np.ndarray],
+                            frame_num: int = 0, total_frames: int = 0,
+                            fps: float = 30.0, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        整帧只拷贝一次：复制到 out（可复用的输出缓冲区，形状需与 image 一致）
+        或新分配的数组中，之后所有绘制都原地进行
+        """
+        profiler = self.profiler
+        
+        with profiler.measure('copy'):
+            if out is None:
+                output = image.copy()
+            else:
+                output = out
+                if out is not image:
+                    np.copyto(output, image)
+        
+        if landmarks is not None:
+            h, w = image.shape[:2]
+            points = PoseEstimator.to_pixel_coords(landmarks, (h, w))
+            visible = PoseEstimator.get_visibility_mask(landmarks)
+            
+            if visible.any():
+                with profiler.measure('draw_skeleton'):
+                    self._draw_skeleton_inplace(output, points, visible)
+                with profiler.measure('draw_angles'):
+                    self._draw_angles_inplace(output, points, visible)
+        
+        with profiler.measure('draw_info_panel'):
+            self._draw_info_panel_inplace(output, frame_num, total_frames, fps)
         
         return output
 
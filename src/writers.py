@@ -0,0 +1,168 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Dict, Optional, Tuple
+import cv2
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+class EncoderError(Exception):
+    pass
+
+
+class OpenCVWriter:
+    """cv2.VideoWriter，codec 为 FourCC（如 mp4v、FFV1）"""
+
+    def __init__(self, output_path: str, fps: float, size: Tuple[int, int], codec: str):
+        self.error: Optional[str] = None
+        self._writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*codec), fps, size)
+
+    def isOpened(self) -> bool:
+        return self._writer.isOpened()
+
+    def write(self, frame: np.ndarray):
+        self._writer.write(frame)
+
+    def release(self):
+        self._writer.release()
+
+
+class FFmpegPipeWriter:
+    """
+    把原始 BGR24 帧通过管道送入外部编码器进程（ffmpeg），编码在另一个进程中与推理、绘制并行进行，
+    可使用 libx264/libx265 等编码器及其多线程。每帧直接以 memoryview 写入管道，不做额外拷贝。
+
+    编码器中途退出时 write 抛出 EncoderError；release 等待编码器结束，退出码非零时记录到 error。
+    """
+
+    # Linux 上把管道缓冲区加大到 1 MB，减少每帧写入时与编码器进程之间的切换
+    PIPE_SIZE = 1 << 20
+
+    def __init__(self, output_path: str, fps: float, size: Tuple[int, int],
+                 binary: str = 'ffmpeg', codec: str = 'libx264',
+                 preset: Optional[str] = 'veryfast', crf: Optional[int] = 23,
+                 threads: int = 0, pix_fmt: str = 'yuv420p'):
+        self.size = tuple(size)
+        self.error: Optional[str] = None
+        self._stderr = tempfile.TemporaryFile()
+
+        command = [binary, '-hide_banner', '-loglevel', 'error', '-y',
+                   '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+                   '-s', f"{size[0]}x{size[1]}", '-r', f"{fps:.6g}", '-i', '-',
+                   '-an', '-c:v', codec]
+        if preset:
+            command += ['-preset', preset]
+        if crf is not None:
+            command += ['-crf', str(crf)]
+        command += ['-threads', str(threads), '-pix_fmt', pix_fmt, output_path]
+
+        try:
+            self._proc = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                          stdout=subprocess.DEVNULL, stderr=self._stderr)
+        except OSError as e:
+            self._proc = None
+            self.error = str(e)
+            self._stderr.close()
+            return
+
+        if fcntl is not None and hasattr(fcntl, 'F_SETPIPE_SZ'):
+            try:
+                fcntl.fcntl(self._proc.stdin.fileno(), fcntl.F_SETPIPE_SZ, self.PIPE_SIZE)
+            except OSError:
+                pass
+
+    def isOpened(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def _encoder_message(self) -> str:
+        self._stderr.seek(0)
+        lines = self._stderr.read().decode('utf-8', errors='replace').strip().splitlines()
+        return lines[-1] if lines else f"encoder exited with code {self._proc.poll()}"
+
+    def write(self, frame: np.ndarray):
+        if self._proc is None:
+            raise EncoderError(self.error or "Encoder is not running")
+        if (frame.shape[1], frame.shape[0]) != self.size or frame.dtype != np.uint8:
+            raise EncoderError(f"Frame size {frame.shape[1]}x{frame.shape[0]} does not match "
+                               f"encoder size {self.size[0]}x{self.size[1]}")
+        try:
+            self._proc.stdin.write(memoryview(np.ascontiguousarray(frame)))
+        except (BrokenPipeError, ValueError):
+            self._proc.wait()
+            self.error = self._encoder_message()
+            raise EncoderError(f"Encoder failed: {self.error}")
+
+    def release(self):
+        if self._proc is None:
+            return
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        if self._proc.wait() != 0 and self.error is None:
+            self.error = self._encoder_message()
+        self._stderr.close()
+        self._proc = None
+
+
+class ThumbnailStripWriter:
+    """
+    缩略图条：收集写入的帧，release 时按每行 columns 张拼成一张图片写出（最后一行不足时补黑）。
+    所有帧都保存在内存中，只适合抽帧后的少量小图。
+    """
+
+    def __init__(self, output_path: str, size: Tuple[int, int], columns: int = 10):
+        self.output_path = output_path
+        self.size = tuple(size)
+        self.columns = max(1, columns)
+        self.error: Optional[str] = None
+        self._frames = []
+
+    def isOpened(self) -> bool:
+        return os.path.isdir(os.path.dirname(os.path.abspath(self.output_path)))
+
+    def write(self, frame: np.ndarray):
+        self._frames.append(frame.copy())
+
+    def release(self):
+        if not self._frames:
+            return
+        columns = min(self.columns, len(self._frames))
+        blank = np.zeros_like(self._frames[0])
+        frames = self._frames + [blank] * (-len(self._frames) % columns)
+        rows = [cv2.hconcat(frames[i:i + columns]) for i in range(0, len(frames), columns)]
+        if not cv2.imwrite(self.output_path, cv2.vconcat(rows)):
+            self.error = f"Cannot write image: {self.output_path}"
+        self._frames = []
+
+
+_warned = set()
+
+
+def open_writer(output_path: str, fps: float, size: Tuple[int, int], config: Dict,
+                codec: Optional[str] = None):
+    """
+    按视频配置创建输出：encoder 为 'ffmpeg' 且能找到编码器时使用 FFmpegPipeWriter，否则使用
+    OpenCVWriter (output_codec)。显式给出 codec 时（分段/分块的无损中间文件）总是使用 OpenCV。
+    """
+    if codec is None and config.get('encoder', 'opencv') == 'ffmpeg':
+        binary = shutil.which(config['ffmpeg_binary'])
+        if binary is not None:
+            return FFmpegPipeWriter(output_path, fps, size, binary, config['ffmpeg_codec'],
+                                    config['ffmpeg_preset'], config['ffmpeg_crf'],
+                                    config['ffmpeg_threads'], config['ffmpeg_pix_fmt'])
+        if config['ffmpeg_binary'] not in _warned:
+            _warned.add(config['ffmpeg_binary'])
+            print(f"Warning: encoder '{config['ffmpeg_binary']}' not found, "
+                  f"falling back to OpenCV ({config['output_codec']})")
+
+    return OpenCVWriter(output_path, fps, size, codec or config['output_codec'])